@@ -0,0 +1,88 @@
+"""So sánh độ trễ p50/p95/p99 giữa truy vấn đồng bộ (chặn event loop) và
+lớp truy cập dữ liệu bất đồng bộ common.db.Database với nhiều client đồng thời.
+
+Chạy: python benchmarks/bench_async_db.py --clients 20 --requests 1000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from fastapi import FastAPI
+
+from harness import run_clients, start_server
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"
+    )
+)
+
+from common.db import Database  # noqa: E402
+
+
+class FakeQuery:
+    """Giả lập một round trip PostgREST, thỉnh thoảng có truy vấn chậm"""
+
+    def __init__(self, latency: float, slow_latency: float, slow_ratio: float):
+        self.latency = slow_latency if random.random() < slow_ratio else latency
+
+    def execute_blocking(self):
+        time.sleep(self.latency)
+        return []
+
+    async def execute(self):
+        await asyncio.sleep(self.latency)
+        return []
+
+
+def create_app(args) -> FastAPI:
+    app = FastAPI()
+    db = Database("http://bench.local", "bench", max_concurrency=args.max_concurrency)
+
+    def new_query():
+        return FakeQuery(args.latency, args.slow_latency, args.slow_ratio)
+
+    @app.get("/sync")
+    async def sync_handler():
+        # Cách cũ: gọi client đồng bộ trực tiếp trong async def
+        return new_query().execute_blocking()
+
+    @app.get("/async")
+    async def async_handler():
+        return await db.execute(new_query())
+
+    return app
+
+
+async def main(args):
+    server = start_server(create_app, args)
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(
+        f"clients={args.clients} requests={args.requests} "
+        f"latency={args.latency * 1000:.0f}ms slow={args.slow_latency * 1000:.0f}ms "
+        f"({args.slow_ratio:.0%}) max_concurrency={args.max_concurrency}\n"
+    )
+    print(f"{'mode':<8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for mode in ("sync", "async"):
+        result = await run_clients(base_url, f"/{mode}", args.clients, args.requests)
+        print(
+            f"{mode:<8}{result['p50']:>10.1f}{result['p95']:>10.1f}"
+            f"{result['p99']:>10.1f}{result['throughput']:>10.1f}"
+        )
+    server.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=0.3)
+    parser.add_argument("--slow-ratio", type=float, default=0.02)
+    parser.add_argument("--max-concurrency", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8099)
+    asyncio.run(main(parser.parse_args()))
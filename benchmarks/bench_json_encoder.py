@@ -0,0 +1,94 @@
+"""So sánh thời gian mã hoá JSON của UnicodeJSONResponse giữa thư viện chuẩn
+và orjson trên dữ liệu đơn hàng giống thực tế (có Decimal, datetime, tiếng Việt).
+
+Chạy: python benchmarks/bench_json_encoder.py --orders 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"
+    )
+)
+
+from common.responses import ENCODERS  # noqa: E402
+
+NOTES = [None, "Ít cay", "Không hành", "Mang về", "Thêm đá, ít đường"]
+DISHES = [
+    ("Bò bít tết", Decimal("250000.00")),
+    ("Salad Ceasar", Decimal("85000.00")),
+    ("Súp cua", Decimal("65000.00")),
+    ("Phở bò tái", Decimal("75000.00")),
+    ("Cà phê sữa đá", Decimal("35000.00")),
+]
+
+
+def make_orders(count: int, items_per_order: int) -> list:
+    random.seed(42)
+    now = datetime(2024, 5, 1, 11, 30)
+    orders = []
+    for order_id in range(1, count + 1):
+        created_at = now + timedelta(minutes=order_id)
+        items = []
+        for line in range(items_per_order):
+            name, price = random.choice(DISHES)
+            items.append(
+                {
+                    "id": order_id * 100 + line,
+                    "order_id": order_id,
+                    "item_id": DISHES.index((name, price)) + 1,
+                    "name": name,
+                    "quantity": random.randint(1, 4),
+                    "price": price,
+                    "note": random.choice(NOTES),
+                    "status": "pending",
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+            )
+        orders.append(
+            {
+                "id": order_id,
+                "table_id": random.randint(1, 30),
+                "user_id": random.randint(1, 5),
+                "status": random.choice(["pending", "preparing", "ready"]),
+                "total_amount": sum(i["price"] * i["quantity"] for i in items),
+                "created_at": created_at,
+                "updated_at": created_at,
+                "items": items,
+            }
+        )
+    return orders
+
+
+def main(args):
+    payload = make_orders(args.orders, args.items)
+    print(f"orders={args.orders} items/order={args.items} repeat={args.repeat}\n")
+    print(f"{'encoder':<10}{'ms/call':>10}{'MB/s':>10}{'bytes':>12}")
+    baseline = None
+    for name, encode in ENCODERS.items():
+        size = len(encode(payload))
+        seconds = min(
+            timeit.repeat(lambda: encode(payload), number=args.repeat, repeat=3)
+        )
+        per_call = seconds / args.repeat
+        baseline = baseline or per_call
+        print(
+            f"{name:<10}{per_call * 1000:>10.2f}{size / per_call / 1e6:>10.1f}"
+            f"{size:>12}   x{baseline / per_call:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--items", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
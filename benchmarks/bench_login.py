@@ -0,0 +1,92 @@
+"""Đo ảnh hưởng của bcrypt tới event loop khi nhiều người đăng nhập cùng lúc:
+băm trực tiếp trong handler so với PasswordWorkerPool của user-service.
+
+Song song với các lần đăng nhập, một nhóm client khác gọi endpoint rẻ (/ping)
+để thấy độ trễ của các request không liên quan bị kéo theo ra sao.
+
+Chạy: python benchmarks/bench_login.py --logins 200 --clients 16
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+import bcrypt
+from fastapi import FastAPI
+
+from harness import run_clients, start_server
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "services",
+        "user-service",
+    )
+)
+
+from app.auth import PasswordWorkerPool  # noqa: E402
+
+PASSWORD = "matkhau123"
+
+
+def create_app(args) -> FastAPI:
+    app = FastAPI()
+    pool = PasswordWorkerPool(args.workers, args.max_queue)
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.rounds)).decode()
+
+    def check():
+        return bcrypt.checkpw(PASSWORD.encode(), hashed.encode())
+
+    @app.post("/inline")
+    async def inline_login():
+        # Cách cũ: bcrypt chạy trên event loop
+        return {"ok": check()}
+
+    @app.post("/pool")
+    async def pool_login():
+        return {"ok": await pool.run(check)}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/stats")
+    async def stats():
+        return pool.stats()
+
+    return app
+
+
+async def main(args):
+    server = start_server(create_app, args)
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(
+        f"logins={args.logins} clients={args.clients} rounds={args.rounds} "
+        f"workers={args.workers} cpus={os.cpu_count()}\n"
+    )
+    print(
+        f"{'mode':<8}{'login p50':>11}{'login p99':>11}{'logins/s':>10}"
+        f"{'ping p50':>10}{'ping p99':>10}"
+    )
+    for mode in ("inline", "pool"):
+        login, ping = await asyncio.gather(
+            run_clients(base_url, f"/{mode}", args.clients, args.logins, method="POST"),
+            run_clients(base_url, "/ping", 4, args.logins),
+        )
+        print(
+            f"{mode:<8}{login['p50']:>11.1f}{login['p99']:>11.1f}"
+            f"{login['throughput']:>10.1f}{ping['p50']:>10.1f}{ping['p99']:>10.1f}"
+        )
+    server.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8098)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,113 @@
+"""So sánh bộ nhớ (RSS) và thời gian khởi động nguội giữa sáu tiến trình
+riêng (như run_services.py, mỗi service 1 worker, không reload) và monolith.py.
+
+Chỉ chạy trên Linux (đọc RSS từ /proc). Cần SUPABASE_URL/SUPABASE_KEY, không
+cần kết nối DB thật vì chỉ chờ /livez.
+
+Chạy: python benchmarks/bench_monolith.py --runs 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+import httpx
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = [
+    ("user-service", 8001),
+    ("table-service", 8002),
+    ("menu-service", 8003),
+    ("order-service", 8004),
+    ("kitchen-service", 8005),
+    ("payment-service", 8006),
+]
+MONOLITH_PORT = 8080
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def uvicorn(app: str, port: int, cwd: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port)],
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(urls: List[str]):
+    pending = set(urls)
+    with httpx.Client(timeout=1.0) as client:
+        while pending:
+            for url in list(pending):
+                try:
+                    if client.get(url).status_code == 200:
+                        pending.discard(url)
+                except httpx.HTTPError:
+                    pass
+            time.sleep(0.05)
+
+
+def measure(mode: str) -> dict:
+    started = time.perf_counter()
+    if mode == "separate":
+        processes = [
+            uvicorn("app.main:app", port, os.path.join(ROOT_DIR, "services", service))
+            for service, port in SERVICES
+        ]
+        urls = [f"http://127.0.0.1:{port}/livez" for _, port in SERVICES]
+    else:
+        processes = [uvicorn("monolith:app", MONOLITH_PORT, ROOT_DIR)]
+        urls = [
+            f"http://127.0.0.1:{MONOLITH_PORT}/{service.split('-')[0]}/livez"
+            for service, _ in SERVICES
+        ]
+    wait_ready(urls)
+    cold_start = time.perf_counter() - started
+    # Đợi các vòng kiểm tra nền chạy xong lần đầu rồi mới đo bộ nhớ
+    time.sleep(1)
+    rss = sum(rss_mb(p.pid) for p in processes)
+    for p in processes:
+        p.terminate()
+    for p in processes:
+        p.wait()
+    return {"cold_start": cold_start, "rss": rss, "processes": len(processes)}
+
+
+def main(args):
+    print(f"{'mode':<10}{'procs':>6}{'cold start s':>14}{'RSS MB':>10}")
+    results = {}
+    for mode in ("separate", "monolith"):
+        runs = [measure(mode) for _ in range(args.runs)]
+        result = {
+            "cold_start": min(r["cold_start"] for r in runs),
+            "rss": sum(r["rss"] for r in runs) / len(runs),
+            "processes": runs[0]["processes"],
+        }
+        results[mode] = result
+        print(
+            f"{mode:<10}{result['processes']:>6}{result['cold_start']:>14.2f}"
+            f"{result['rss']:>10.1f}"
+        )
+    separate, monolith = results["separate"], results["monolith"]
+    print(
+        f"\nmonolith saves {separate['rss'] - monolith['rss']:.1f} MB RSS "
+        f"({1 - monolith['rss'] / separate['rss']:.0%}) and "
+        f"{separate['cold_start'] - monolith['cold_start']:.2f}s cold start"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    main(parser.parse_args())
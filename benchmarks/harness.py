@@ -0,0 +1,67 @@
+"""Các hàm dùng chung cho các benchmark: chạy server riêng và tính percentile."""
+
+import asyncio
+import multiprocessing
+import time
+from typing import Callable, List
+
+import httpx
+import uvicorn
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def _serve(create_app: Callable, args):
+    uvicorn.run(create_app(args), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def start_server(create_app: Callable, args) -> multiprocessing.Process:
+    """Chạy app trong process riêng để client đo độ trễ độc lập với server"""
+    process = multiprocessing.Process(
+        target=_serve, args=(create_app, args), daemon=True
+    )
+    process.start()
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/docs")
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+
+async def run_clients(
+    base_url: str, path: str, clients: int, total: int, method="GET", json=None
+) -> dict:
+    """Gửi `total` request tới `path` từ `clients` kết nối đồng thời"""
+    latencies = []
+    remaining = iter(range(total))
+    limits = httpx.Limits(max_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as c:
+
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await c.request(method, path, json=json)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {**latency_summary(latencies), "throughput": total / elapsed}
@@ -0,0 +1,385 @@
+"""Mô phỏng một ngày làm việc của nhà hàng với tải mở (open-loop).
+
+Khách đến theo phân phối Poisson với tốc độ `--rate` nhóm/giây, không phụ
+thuộc việc các nhóm trước đã xong hay chưa. Mỗi nhóm: mở bàn, gọi món, có thể
+điều chỉnh món, bếp nhận đơn và hoàn thành từng món, thanh toán, đóng bàn.
+Song song đó quản lý xem báo cáo doanh thu và danh sách đơn.
+
+Kết quả là JSON gồm p50/p95/p99, tỉ lệ lỗi và throughput theo từng endpoint.
+
+Chạy trên SQLite cục bộ (tự khởi động monolith.py với DB_BACKEND=sqlite):
+    python benchmarks/load_day.py --local --rate 2 --duration 60 --out day.json
+
+Chạy với các service đang chạy sẵn ở cổng 8001-8006:
+    python benchmarks/load_day.py --rate 2 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+import httpx
+
+from harness import percentile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVICE_PORTS = {
+    "user": 8001,
+    "table": 8002,
+    "menu": 8003,
+    "order": 8004,
+    "kitchen": 8005,
+    "payment": 8006,
+}
+PAYMENT_METHODS = ["cash", "card", "transfer"]
+
+
+class Recorder:
+    """Gom độ trễ và lỗi theo endpoint (method + route template)"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.parties = {"arrived": 0, "served": 0, "dropped": 0, "failed": 0}
+
+    def record(self, endpoint: str, latency_ms: float, ok: bool):
+        self.latencies.setdefault(endpoint, []).append(latency_ms)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, elapsed: float, config: dict) -> dict:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            errors = self.errors.get(endpoint, 0)
+            endpoints[endpoint] = {
+                "count": len(latencies),
+                "errors": errors,
+                "error_rate": round(errors / len(latencies), 4),
+                "throughput_rps": round(len(latencies) / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p95_ms": round(percentile(latencies, 95), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+            }
+        total = sum(e["count"] for e in endpoints.values())
+        errors = sum(e["errors"] for e in endpoints.values())
+        return {
+            "config": config,
+            "elapsed_seconds": round(elapsed, 2),
+            "parties": self.parties,
+            "totals": {
+                "requests": total,
+                "errors": errors,
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "throughput_rps": round(total / elapsed, 2),
+            },
+            "endpoints": endpoints,
+        }
+
+
+class RestaurantDay:
+    def __init__(self, urls: Dict[str, str], args):
+        self.urls = urls
+        self.args = args
+        self.recorder = Recorder()
+        self.client = httpx.AsyncClient(
+            timeout=30.0, limits=httpx.Limits(max_connections=args.max_connections)
+        )
+        self.free_tables: "asyncio.Queue[int]" = asyncio.Queue()
+        self.menu_item_ids: List[int] = []
+        self.staff: dict = {}
+        self.admin: dict = {}
+
+    async def call(
+        self,
+        service: str,
+        method: str,
+        route: str,
+        user: Optional[dict] = None,
+        **kwargs,
+    ) -> Optional[httpx.Response]:
+        """Gọi `route` (dạng template, vd. /orders/{order_id}) và ghi nhận kết quả"""
+        path = route.format(**kwargs.pop("path", {}))
+        headers = {"Authorization": f"Bearer {user['access_token']}"} if user else {}
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, self.urls[service] + path, headers=headers, **kwargs
+            )
+        except httpx.HTTPError:
+            response = None
+        ok = response is not None and response.status_code < 400
+        self.recorder.record(
+            f"{method} {route}", (time.perf_counter() - start) * 1000, ok
+        )
+        return response if ok else None
+
+    async def think(self):
+        await asyncio.sleep(random.expovariate(1 / self.args.think))
+
+    async def setup(self):
+        for name, target in (("nhanvien1", self.staff), ("admin", self.admin)):
+            response = await self.client.post(
+                self.urls["user"] + "/users/login",
+                json={"username": name, "password": "test123"},
+            )
+            response.raise_for_status()
+            target.update(response.json())
+
+        headers = {"Authorization": f"Bearer {self.admin['access_token']}"}
+        response = await self.client.get(
+            self.urls["table"] + "/tables", headers=headers
+        )
+        tables = response.json()
+        numbers = {table["number"] for table in tables}
+        for number in range(1, self.args.tables + 1):
+            if number not in numbers:
+                created = await self.client.post(
+                    self.urls["table"] + "/tables",
+                    json={"number": number},
+                    headers=headers,
+                )
+                tables.append(created.json())
+        for table in tables:
+            if table["status"] == "available":
+                self.free_tables.put_nowait(table["id"])
+
+        response = await self.client.get(self.urls["menu"] + "/menu-items")
+        self.menu_item_ids = [
+            item["id"] for item in response.json() if item["status"] == "available"
+        ]
+
+    async def party(self):
+        recorder = self.recorder
+        recorder.parties["arrived"] += 1
+        try:
+            table_id = await asyncio.wait_for(
+                self.free_tables.get(), timeout=self.args.table_wait
+            )
+        except asyncio.TimeoutError:
+            recorder.parties["dropped"] += 1
+            return
+
+        try:
+            if await self.serve(table_id):
+                recorder.parties["served"] += 1
+            else:
+                recorder.parties["failed"] += 1
+        finally:
+            self.free_tables.put_nowait(table_id)
+
+    async def serve(self, table_id: int) -> bool:
+        staff = self.staff
+        user_id = staff["id"]
+        table = {"table_id": table_id, "user_id": user_id}
+        if not await self.call("table", "POST", "/tables/open", staff, json=table):
+            return False
+        await self.think()
+
+        dishes = random.sample(
+            self.menu_item_ids, k=min(len(self.menu_item_ids), random.randint(1, 4))
+        )
+        order = {
+            "table_id": table_id,
+            "items": [
+                {"item_id": item_id, "quantity": random.randint(1, 3)}
+                for item_id in dishes
+            ],
+        }
+        created = await self.call("order", "POST", "/orders", staff, json=order)
+        if created is not None:
+            order_id = created.json()["order_id"]
+            await self.cook_and_bill(order_id, created.json()["items"])
+
+        await self.think()
+        closed = await self.call("table", "POST", "/tables/close", staff, json=table)
+        return created is not None and closed is not None
+
+    async def cook_and_bill(self, order_id: int, items: List[dict]):
+        staff = self.staff
+        ids = {"order_id": order_id}
+        await self.think()
+        if random.random() < self.args.adjust_ratio:
+            adjustment = [
+                {
+                    "item_id": random.choice(self.menu_item_ids),
+                    "quantity": 1,
+                    "action": "add",
+                }
+            ]
+            await self.call(
+                "order",
+                "PUT",
+                "/orders/{order_id}/adjust",
+                staff,
+                path=ids,
+                json=adjustment,
+            )
+            response = await self.call(
+                "order", "GET", "/orders/{order_id}", staff, path=ids
+            )
+            if response is not None:
+                items = response.json()["items"]
+
+        await self.call(
+            "order",
+            "PUT",
+            "/orders/{order_id}/status",
+            staff,
+            path=ids,
+            json={"status": "preparing", "expected_status": "pending"},
+        )
+        for item in items:
+            await self.think()
+            await self.call(
+                "kitchen",
+                "PUT",
+                "/kitchen/order-items/{item_id}/status",
+                path={"item_id": item["id"]},
+                params={"status": "completed"},
+            )
+
+        await self.think()
+        bill = {
+            "order_id": order_id,
+            "payment_method": random.choice(PAYMENT_METHODS),
+            "created_by": staff["id"],
+        }
+        await self.call("payment", "POST", "/payments/bills", staff, json=bill)
+
+    async def kitchen_display(self, stop: asyncio.Event):
+        while not stop.is_set():
+            await self.call(
+                "kitchen",
+                "GET",
+                "/kitchen/pending-orders",
+                params={"status": ["pending", "preparing"]},
+            )
+            await asyncio.sleep(self.args.poll_interval)
+
+    async def manager(self, stop: asyncio.Event):
+        today = date.today().isoformat()
+        while not stop.is_set():
+            await self.call("order", "GET", "/orders", self.admin)
+            await self.call(
+                "payment",
+                "GET",
+                "/reports/revenue/summary",
+                self.admin,
+                params={"start_date": today, "end_date": today},
+            )
+            await self.call(
+                "payment",
+                "GET",
+                "/payments/reports/daily",
+                self.admin,
+                params={"date": today},
+            )
+            await self.call("menu", "GET", "/menu")
+            await asyncio.sleep(self.args.report_interval)
+
+    async def run(self) -> dict:
+        await self.setup()
+        stop = asyncio.Event()
+        background = [
+            asyncio.create_task(self.kitchen_display(stop)),
+            asyncio.create_task(self.manager(stop)),
+        ]
+        parties = []
+        started = time.perf_counter()
+        # Tải mở: nhóm khách mới đến theo lịch, không chờ nhóm trước
+        while time.perf_counter() - started < self.args.duration:
+            parties.append(asyncio.create_task(self.party()))
+            await asyncio.sleep(random.expovariate(self.args.rate))
+        await asyncio.gather(*parties)
+        stop.set()
+        await asyncio.gather(*background)
+        elapsed = time.perf_counter() - started
+        await self.client.aclose()
+
+        config = {
+            key: value for key, value in vars(self.args).items() if key not in ("out",)
+        }
+        return self.recorder.report(elapsed, config)
+
+
+def start_local_monolith(port: int) -> subprocess.Popen:
+    """Tạo DB SQLite mới, nạp dữ liệu mẫu và chạy monolith.py trên đó"""
+    env = dict(os.environ, DB_BACKEND="sqlite")
+    env["LOCAL_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "load_day.db")
+    subprocess.run(
+        [sys.executable, "init_db.py"],
+        cwd=ROOT_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "monolith:app", "--port", str(port)],
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/livez")
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+
+def main(args):
+    random.seed(args.seed)
+    server = None
+    if args.local:
+        server = start_local_monolith(args.port)
+        args.base_url = f"http://127.0.0.1:{args.port}"
+
+    if args.base_url:
+        # Các service mount dưới prefix của monolith.py
+        urls = {name: f"{args.base_url}/{name}" for name in SERVICE_PORTS}
+    else:
+        urls = {
+            name: f"http://localhost:{port}" for name, port in SERVICE_PORTS.items()
+        }
+
+    try:
+        report = asyncio.run(RestaurantDay(urls, args).run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=1.0, help="nhóm khách/giây")
+    parser.add_argument("--duration", type=float, default=60.0, help="giây")
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--table-wait", type=float, default=5.0)
+    parser.add_argument("--think", type=float, default=0.2)
+    parser.add_argument("--adjust-ratio", type=float, default=0.3)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="URL của monolith.py thay cho 6 cổng")
+    parser.add_argument("--local", action="store_true")
+    parser.add_argument("--port", type=int, default=8097)
+    parser.add_argument("--out", help="ghi báo cáo JSON ra file")
+    main(parser.parse_args())
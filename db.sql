@@ -1,4 +1,5 @@
 -- Drop tables in correct order (children first, then parents)
+DROP TABLE IF EXISTS daily_revenue;
 DROP TABLE IF EXISTS bills;
 DROP TABLE IF EXISTS order_items;
 DROP TABLE IF EXISTS orders;
@@ -66,10 +67,12 @@ CREATE TABLE IF NOT EXISTS orders (
     id BIGSERIAL PRIMARY KEY,
     table_id BIGINT REFERENCES tables(id),
     status VARCHAR(20) NOT NULL,
-    total_amount DECIMAL(10,2) NOT NULL,
+    total_amount DECIMAL(10,2) NOT NULL DEFAULT 0,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
-    user_id BIGINT REFERENCES users(id)
+    user_id BIGINT REFERENCES users(id),
+    items_total INT NOT NULL DEFAULT 0,
+    items_completed INT NOT NULL DEFAULT 0
 );
 
 -- Order items table
@@ -109,4 +112,221 @@ CREATE TABLE IF NOT EXISTS opening_table (
 -- Create partial unique index for open tables
 CREATE UNIQUE INDEX IF NOT EXISTS idx_unique_open_table 
 ON opening_table (table_id)
-WHERE status = 'open';
\ No newline at end of file
+WHERE status = 'open';
+
+-- Speeds up date-range reports and keyset pagination on bills
+CREATE INDEX IF NOT EXISTS idx_bills_created_at ON bills (created_at, id);
+
+-- Revenue grouped by payment method, aggregated in the database
+CREATE OR REPLACE FUNCTION revenue_by_payment_method(
+    start_date TIMESTAMPTZ DEFAULT NULL,
+    end_date TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS TABLE (payment_method VARCHAR, total_amount NUMERIC, total_bills BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT b.payment_method, SUM(b.total_amount), COUNT(*)
+    FROM bills b
+    WHERE (start_date IS NULL OR b.created_at >= start_date)
+      AND (end_date IS NULL OR b.created_at <= end_date)
+    GROUP BY b.payment_method;
+$$;
+
+-- Daily revenue rollup, one row per (date, payment_method)
+CREATE TABLE IF NOT EXISTS daily_revenue (
+    date DATE NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL DEFAULT 0,
+    total_bills INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, payment_method)
+);
+
+-- Keep daily_revenue up to date in the same transaction as each bill insert
+CREATE OR REPLACE FUNCTION apply_bill_to_daily_revenue()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO daily_revenue (date, payment_method, total_amount, total_bills)
+    VALUES ((NEW.created_at AT TIME ZONE 'UTC')::DATE, NEW.payment_method, NEW.total_amount, 1)
+    ON CONFLICT (date, payment_method) DO UPDATE
+    SET total_amount = daily_revenue.total_amount + EXCLUDED.total_amount,
+        total_bills = daily_revenue.total_bills + 1;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_bills_daily_revenue ON bills;
+CREATE TRIGGER trg_bills_daily_revenue
+AFTER INSERT ON bills
+FOR EACH ROW EXECUTE FUNCTION apply_bill_to_daily_revenue();
+
+-- Recompute daily_revenue from bills for a date range (NULL = unbounded)
+CREATE OR REPLACE FUNCTION rebuild_daily_revenue(
+    start_date DATE DEFAULT NULL,
+    end_date DATE DEFAULT NULL
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    rebuilt INT;
+BEGIN
+    DELETE FROM daily_revenue d
+    WHERE (start_date IS NULL OR d.date >= start_date)
+      AND (end_date IS NULL OR d.date <= end_date);
+
+    INSERT INTO daily_revenue (date, payment_method, total_amount, total_bills)
+    SELECT (b.created_at AT TIME ZONE 'UTC')::DATE, b.payment_method, SUM(b.total_amount), COUNT(*)
+    FROM bills b
+    WHERE (start_date IS NULL OR (b.created_at AT TIME ZONE 'UTC')::DATE >= start_date)
+      AND (end_date IS NULL OR (b.created_at AT TIME ZONE 'UTC')::DATE <= end_date)
+    GROUP BY 1, 2;
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$;
+
+-- Validate and apply an order status transition atomically: lock the order row,
+-- check the current status, then update orders and order_items together.
+-- outcome: updated | invalid | conflict (p_expected_status differs) | not_found
+CREATE OR REPLACE FUNCTION transition_order_status(
+    p_order_id BIGINT,
+    p_status VARCHAR,
+    p_allowed_from VARCHAR[],
+    p_expected_status VARCHAR DEFAULT NULL
+)
+RETURNS TABLE (outcome TEXT, current_status VARCHAR)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_current VARCHAR;
+BEGIN
+    SELECT o.status INTO v_current FROM orders o WHERE o.id = p_order_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'not_found'::TEXT, NULL::VARCHAR;
+    ELSIF p_expected_status IS NOT NULL AND v_current <> p_expected_status THEN
+        RETURN QUERY SELECT 'conflict'::TEXT, v_current;
+    ELSIF NOT (v_current = ANY(p_allowed_from)) THEN
+        RETURN QUERY SELECT 'invalid'::TEXT, v_current;
+    ELSE
+        UPDATE orders SET status = p_status WHERE id = p_order_id;
+        UPDATE order_items SET status = p_status WHERE order_id = p_order_id;
+        RETURN QUERY SELECT 'updated'::TEXT, v_current;
+    END IF;
+END;
+$$;
+
+-- Apply a batched order adjustment in one transaction: bulk insert, bulk update
+-- and bulk delete of order_items, returning the new orders.total_amount.
+-- Raises P0001 if the order is missing or no longer adjustable.
+CREATE OR REPLACE FUNCTION apply_order_adjustment(
+    p_order_id BIGINT,
+    p_inserts JSONB DEFAULT '[]',
+    p_updates JSONB DEFAULT '[]',
+    p_delete_ids BIGINT[] DEFAULT '{}'
+)
+RETURNS NUMERIC
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_total NUMERIC;
+BEGIN
+    PERFORM 1 FROM orders
+    WHERE id = p_order_id AND status IN ('pending', 'preparing')
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Order cannot be adjusted in current state';
+    END IF;
+
+    INSERT INTO order_items (order_id, item_id, quantity, price, note, status)
+    SELECT p_order_id, r.item_id, r.quantity, r.price, r.note, 'pending'
+    FROM jsonb_to_recordset(p_inserts) AS r(item_id BIGINT, quantity INT, price NUMERIC, note TEXT);
+
+    UPDATE order_items oi
+    SET quantity = r.quantity, note = r.note
+    FROM jsonb_to_recordset(p_updates) AS r(id BIGINT, quantity INT, note TEXT)
+    WHERE oi.id = r.id AND oi.order_id = p_order_id;
+
+    DELETE FROM order_items
+    WHERE order_id = p_order_id AND id = ANY(p_delete_ids);
+
+    -- total_amount was kept up to date by trg_order_items_counters
+    SELECT total_amount INTO v_total FROM orders WHERE id = p_order_id;
+    RETURN v_total;
+END;
+$$;
+
+-- Keep orders.total_amount, items_total and items_completed in step with
+-- order_items by applying each row change as a delta, in the same transaction
+CREATE OR REPLACE FUNCTION apply_order_item_delta()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE orders
+        SET total_amount = total_amount - OLD.price * OLD.quantity,
+            items_total = items_total - 1,
+            items_completed = items_completed - (OLD.status = 'completed')::INT
+        WHERE id = OLD.order_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE orders
+        SET total_amount = total_amount + NEW.price * NEW.quantity,
+            items_total = items_total + 1,
+            items_completed = items_completed + (NEW.status = 'completed')::INT
+        WHERE id = NEW.order_id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_order_items_counters ON order_items;
+CREATE TRIGGER trg_order_items_counters
+AFTER INSERT OR DELETE OR UPDATE OF order_id, quantity, price, status ON order_items
+FOR EACH ROW EXECUTE FUNCTION apply_order_item_delta();
+
+-- Repair job: recompute the order counters from order_items and fix the rows
+-- that drifted (NULL = all orders). Returns the number of orders repaired.
+CREATE OR REPLACE FUNCTION rebuild_order_counters(
+    since TIMESTAMPTZ DEFAULT NULL
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    repaired INT;
+BEGIN
+    -- Lock the orders first: a concurrent item change commits its trigger
+    -- delta before this point (seen by the next statement) or waits until we
+    -- commit, so it is never overwritten by a stale recount
+    PERFORM 1 FROM orders o
+    WHERE since IS NULL OR o.created_at >= since
+    ORDER BY o.id
+    FOR UPDATE;
+
+    WITH actual AS (
+        SELECT o.id,
+               COALESCE(SUM(oi.price * oi.quantity), 0) AS total_amount,
+               COUNT(oi.id)::INT AS items_total,
+               (COUNT(oi.id) FILTER (WHERE oi.status = 'completed'))::INT AS items_completed
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        WHERE since IS NULL OR o.created_at >= since
+        GROUP BY o.id
+    )
+    UPDATE orders o
+    SET total_amount = a.total_amount,
+        items_total = a.items_total,
+        items_completed = a.items_completed
+    FROM actual a
+    WHERE o.id = a.id
+      AND (o.total_amount, o.items_total, o.items_completed)
+          IS DISTINCT FROM (a.total_amount, a.items_total, a.items_completed);
+
+    GET DIAGNOSTICS repaired = ROW_COUNT;
+    RETURN repaired;
+END;
+$$;
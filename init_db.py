@@ -1,20 +1,21 @@
+import asyncio
 import os
-from datetime import datetime
+import sys
 
 import bcrypt
 from dotenv import load_dotenv
-from supabase import Client, create_client
 
-load_dotenv()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+from common.db import Database  # noqa: E402
 
-# Khởi tạo Supabase client
-supabase: Client = create_client(
-    supabase_url=os.getenv("SUPABASE_URL"), supabase_key=os.getenv("SUPABASE_KEY")
-)
+load_dotenv()
 
 
-def init_database():
-    """Khởi tạo dữ liệu mẫu"""
+async def init_database():
+    """Khởi tạo dữ liệu mẫu (Supabase, hoặc SQLite khi DB_BACKEND=sqlite)"""
+    db = Database.from_env()
+    await db.connect()
     try:
         print("Bắt đầu khởi tạo dữ liệu mẫu...")
 
@@ -45,7 +46,7 @@ def init_database():
                 "status": "active",
             },
         ]
-        supabase.table("users").upsert(users).execute()
+        await db.execute(db.table("users").upsert(users))
 
         # Tạo danh mục món ăn
         print("\nTạo danh mục món ăn...")
@@ -55,7 +56,7 @@ def init_database():
             {"id": 3, "name": "Tráng miệng"},
             {"id": 4, "name": "Đồ uống"},
         ]
-        supabase.table("menu_categories").upsert(categories).execute()
+        await db.execute(db.table("menu_categories").upsert(categories))
 
         # Tạo các món ăn mẫu
         print("\nTạo món ăn mẫu...")
@@ -89,7 +90,7 @@ def init_database():
                 "category_id": 1,
             },
         ]
-        supabase.table("menu_items").upsert(menu_items).execute()
+        await db.execute(db.table("menu_items").upsert(menu_items))
 
         # Tạo bàn mẫu
         print("\nTạo bàn mẫu...")
@@ -99,7 +100,7 @@ def init_database():
             {"number": 3, "status": "available"},
             {"number": 4, "status": "available"},
         ]
-        supabase.table("tables").upsert(tables).execute()
+        await db.execute(db.table("tables").upsert(tables))
 
         # Tạo nguyên liệu mẫu
         print("\nTạo nguyên liệu mẫu...")
@@ -109,11 +110,11 @@ def init_database():
             {"name": "Cá hồi", "quantity": 80, "unit": "kg", "uom": "kg"},
             {"name": "Nấm các loại", "quantity": 30, "unit": "kg", "uom": "kg"},
         ]
-        supabase.table("ingredients").upsert(ingredients).execute()
+        await db.execute(db.table("ingredients").upsert(ingredients))
 
         # Lấy ID của các món ăn và nguyên liệu
-        menu_items_resp = supabase.table("menu_items").select("id,name").execute()
-        ingredients_resp = supabase.table("ingredients").select("id,name").execute()
+        menu_items_resp = await db.execute(db.table("menu_items").select("id,name"))
+        ingredients_resp = await db.execute(db.table("ingredients").select("id,name"))
 
         menu_items_map = {item["name"]: item["id"] for item in menu_items_resp.data}
         ingredients_map = {ing["name"]: ing["id"] for ing in ingredients_resp.data}
@@ -142,14 +143,16 @@ def init_database():
                 "quantity": 0.05,
             },
         ]
-        supabase.table("item_ingredients").upsert(item_ingredients).execute()
+        await db.execute(db.table("item_ingredients").upsert(item_ingredients))
 
         print("\nKhởi tạo dữ liệu mẫu thành công!")
 
     except Exception as e:
         print(f"Lỗi: {str(e)}")
         raise e
+    finally:
+        await db.close()
 
 
 if __name__ == "__main__":
-    init_database()
+    asyncio.run(init_database())
@@ -0,0 +1,110 @@
+"""Chạy cả sáu service trong một tiến trình ASGI, mỗi service dưới một prefix.
+
+Dành cho chi nhánh nhỏ: một interpreter, một Supabase client dùng chung
+(Database.from_env trả về cùng một đối tượng) thay vì sáu tiến trình riêng.
+
+Chạy: uvicorn monolith:app --port 8080
+"""
+
+import importlib
+import importlib.util
+import inspect
+import os
+import sys
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "services")
+
+SERVICES = [
+    ("user-service", "/user"),
+    ("table-service", "/table"),
+    ("menu-service", "/menu"),
+    ("order-service", "/order"),
+    ("kitchen-service", "/kitchen"),
+    ("payment-service", "/payment"),
+]
+
+
+def load_service(service: str) -> FastAPI:
+    """Import services/<service>/app dưới tên gói riêng (vd. user_service) để
+    sáu gói `app` không đè lên nhau trong sys.modules"""
+    package = service.replace("-", "_")
+    package_dir = os.path.join(SERVICES_DIR, service, "app")
+    spec = importlib.util.spec_from_file_location(
+        package,
+        os.path.join(package_dir, "__init__.py"),
+        submodule_search_locations=[package_dir],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[package] = module
+    spec.loader.exec_module(module)
+    return importlib.import_module(f"{package}.main").app
+
+
+app = FastAPI(
+    title="Restaurant Management API",
+    description="Tất cả các service chạy chung một tiến trình",
+    version="1.0.0",
+    docs_url=None,
+    redoc_url=None,
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+service_apps = []
+for service, prefix in SERVICES:
+    service_app = load_service(service)
+    app.mount(prefix, service_app)
+    service_apps.append(service_app)
+
+
+async def run_handlers(handlers):
+    # Bỏ qua handler trùng, vd. db.connect của client dùng chung
+    seen = []
+    for handler in handlers:
+        if handler in seen:
+            continue
+        seen.append(handler)
+        result = handler()
+        if inspect.isawaitable(result):
+            await result
+
+
+# Starlette không chạy sự kiện startup/shutdown của các app được mount
+@app.on_event("startup")
+async def startup():
+    await run_handlers(h for sub in service_apps for h in sub.router.on_startup)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await run_handlers(
+        h for sub in reversed(service_apps) for h in sub.router.on_shutdown
+    )
+
+
+@app.get("/")
+async def root():
+    return {
+        "message": "Restaurant Management System is running",
+        "services": {service: prefix for service, prefix in SERVICES},
+    }
+
+
+@app.get("/livez")
+async def liveness():
+    return {"status": "alive", "services": len(service_apps)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,82 @@
+"""Tính lại bảng tổng hợp daily_revenue từ bảng bills (dùng khi backfill dữ liệu).
+
+Chạy: python rebuild_daily_revenue.py --from 2024-01-01 --to 2024-12-31
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+from common.db import Database  # noqa: E402
+from common.pagination import page_result, paginate  # noqa: E402
+
+load_dotenv()
+
+PAGE_SIZE = 1000
+
+
+async def rebuild_in_python(db: Database, start_date, end_date) -> int:
+    """Gom nhóm bills theo (ngày, phương thức) phía client, từng trang một"""
+    groups = {}
+    cursor = None
+    while True:
+        query = db.table("bills").select("id,created_at,payment_method,total_amount")
+        if start_date:
+            query = query.gte("created_at", f"{start_date}T00:00:00Z")
+        if end_date:
+            query = query.lte("created_at", f"{end_date}T23:59:59.999999Z")
+        response = await db.execute(paginate(query, cursor, PAGE_SIZE))
+        bills, cursor = page_result(response.data, PAGE_SIZE)
+
+        for bill in bills:
+            key = (bill["created_at"][:10], bill["payment_method"])
+            group = groups.setdefault(key, {"total_amount": 0, "total_bills": 0})
+            group["total_amount"] += bill["total_amount"]
+            group["total_bills"] += 1
+        if cursor is None:
+            break
+
+    query = db.table("daily_revenue").delete()
+    query = query.gte("date", start_date or "0001-01-01")
+    query = query.lte("date", end_date or "9999-12-31")
+    await db.execute(query)
+
+    rows = [
+        {"date": date, "payment_method": method, **totals}
+        for (date, method), totals in groups.items()
+    ]
+    if rows:
+        await db.execute(db.table("daily_revenue").upsert(rows))
+    return len(rows)
+
+
+async def rebuild(start_date, end_date):
+    db = Database.from_env()
+    await db.connect()
+    try:
+        if db.supports_rpc:
+            response = await db.execute(
+                db.rpc(
+                    "rebuild_daily_revenue",
+                    {"start_date": start_date, "end_date": end_date},
+                )
+            )
+            rebuilt = response.data
+        else:
+            rebuilt = await rebuild_in_python(db, start_date, end_date)
+        print(f"Đã tính lại {rebuilt} dòng daily_revenue")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--from", dest="start_date", help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="end_date", help="YYYY-MM-DD")
+    args = parser.parse_args()
+    asyncio.run(rebuild(args.start_date, args.end_date))
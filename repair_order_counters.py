@@ -0,0 +1,103 @@
+"""Kiểm tra và sửa các bộ đếm total_amount/items_total/items_completed của bảng
+orders theo dữ liệu thật trong order_items (chạy định kỳ, vd. mỗi đêm bằng cron).
+
+Chạy: python repair_order_counters.py --since 2024-01-01
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+from common.db import Database  # noqa: E402
+from common.pagination import page_result, paginate  # noqa: E402
+
+load_dotenv()
+
+PAGE_SIZE = 500
+COUNTERS = ("total_amount", "items_total", "items_completed")
+
+
+def actual_counters(items) -> dict:
+    return {
+        "total_amount": sum(item["price"] * item["quantity"] for item in items),
+        "items_total": len(items),
+        "items_completed": sum(item["status"] == "completed" for item in items),
+    }
+
+
+def drifted(order: dict, actual: dict) -> bool:
+    # total_amount là số thập phân, so sánh theo đơn vị xu
+    return (
+        round(float(order["total_amount"]) * 100)
+        != round(float(actual["total_amount"]) * 100)
+        or order["items_total"] != actual["items_total"]
+        or order["items_completed"] != actual["items_completed"]
+    )
+
+
+async def repair_in_python(db: Database, since) -> int:
+    """Đọc từng trang đơn hàng kèm món và chỉ ghi lại các đơn bị lệch"""
+    repaired = 0
+    skipped = 0
+    cursor = None
+    while True:
+        query = db.table("orders").select(
+            "id,created_at,"
+            + ",".join(COUNTERS)
+            + ",order_items(price,quantity,status)"
+        )
+        if since:
+            query = query.gte("created_at", since)
+        response = await db.execute(paginate(query, cursor, PAGE_SIZE))
+        orders, cursor = page_result(response.data, PAGE_SIZE)
+
+        for order in orders:
+            actual = actual_counters(order["order_items"])
+            if not drifted(order, actual):
+                continue
+            # Compare-and-set: chỉ ghi khi bộ đếm chưa đổi từ lúc đọc. Nếu món
+            # vừa được thêm/sửa, trigger đã cộng chênh lệch và giá trị tính ở
+            # đây đã cũ, ghi đè sẽ làm lệch lại đơn
+            query = db.table("orders").update(actual).eq("id", order["id"])
+            for counter in COUNTERS:
+                query = query.eq(counter, order[counter])
+            response = await db.execute(query)
+            if response.data:
+                repaired += 1
+            else:
+                skipped += 1
+        if cursor is None:
+            break
+    if skipped:
+        print(
+            f"Bỏ qua {skipped} đơn hàng vừa thay đổi trong lúc kiểm tra, hãy chạy lại"
+        )
+    return repaired
+
+
+async def repair(since):
+    db = Database.from_env()
+    await db.connect()
+    try:
+        if db.supports_rpc:
+            response = await db.execute(
+                db.rpc("rebuild_order_counters", {"since": since})
+            )
+            repaired = response.data
+        else:
+            repaired = await repair_in_python(db, since)
+        print(f"Đã sửa bộ đếm của {repaired} đơn hàng")
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--since", help="chỉ kiểm tra đơn tạo từ ngày này (YYYY-MM-DD)")
+    args = parser.parse_args()
+    asyncio.run(repair(args.since))
@@ -1,75 +1,179 @@
+import argparse
+import importlib.util
 import os
+import shutil
 import signal
 import subprocess
 import sys
+import tempfile
 import time
-from typing import List
+from typing import List, Tuple
 
+import httpx
 
-def run_services():
+SERVICES = [
+    ("user-service", 8001),
+    ("table-service", 8002),
+    ("menu-service", 8003),
+    ("order-service", 8004),
+    ("kitchen-service", 8005),
+    ("payment-service", 8006),
+]
+API_DOCS_PORT = 8000
+
+
+def default_workers() -> int:
+    # Chia CPU cho các service chạy chung một máy, mỗi service ít nhất 2 worker
+    return max(2, (os.cpu_count() or 1) // len(SERVICES))
+
+
+def uvicorn_command(app: str, port: int, prod: bool, workers: int) -> List[str]:
+    cmd = [sys.executable, "-m", "uvicorn", app, "--port", str(port)]
+    if not prod:
+        return cmd + ["--reload"]
+
+    cmd += ["--host", "0.0.0.0", "--workers", str(workers)]
+    # uvloop/httptools là tuỳ chọn, chỉ dùng khi đã được cài
+    if importlib.util.find_spec("uvloop"):
+        cmd += ["--loop", "uvloop"]
+    if importlib.util.find_spec("httptools"):
+        cmd += ["--http", "httptools"]
+    return cmd
+
+
+def wait_until_ready(targets: List[Tuple[str, str]], timeout: float) -> List[str]:
+    """Chờ các service trả về 200 ở URL kiểm tra, trả về danh sách chưa sẵn sàng"""
+    pending = dict(targets)
+    deadline = time.monotonic() + timeout
+    with httpx.Client(timeout=1.0) as client:
+        while pending and time.monotonic() < deadline:
+            for name, url in list(pending.items()):
+                try:
+                    if client.get(url).status_code == 200:
+                        print(f"{name} is ready")
+                        del pending[name]
+                except httpx.HTTPError:
+                    pass
+            if pending:
+                time.sleep(0.2)
+    return list(pending)
+
+
+class ShutdownRequested(Exception):
+    pass
+
+
+def request_shutdown(signum, frame):
+    # Thoát khỏi process.wait() rồi mới dừng các service, không chờ trong signal handler
+    raise ShutdownRequested()
+
+
+def run_services(args):
     # Thư mục gốc của project
     root_dir = os.path.dirname(os.path.abspath(__file__))
 
-    services = [
-        ("user-service", 8001),
-        ("table-service", 8002),
-        ("menu-service", 8003),
-        ("order-service", 8004),
-        ("kitchen-service", 8005),
-        ("payment-service", 8006),
-    ]
-
     processes: List[subprocess.Popen] = []
+    # Nhiều worker ghi metrics ra thư mục riêng của từng service để /metrics gộp lại
+    metrics_dir = tempfile.mkdtemp(prefix="restaurant-metrics-") if args.prod else None
+    signal.signal(signal.SIGINT, request_shutdown)
+    signal.signal(signal.SIGTERM, request_shutdown)
 
     try:
-        # Khởi động các microservices
-        for service, port in services:
+        # Khởi động các microservices cùng lúc, mỗi service trong thư mục của nó
+        for service, port in SERVICES:
+            cmd = uvicorn_command("app.main:app", port, args.prod, args.workers)
             service_dir = os.path.join(root_dir, "services", service)
-            os.chdir(service_dir)  # Di chuyển vào thư mục service
-            cmd = f"uvicorn app.main:app --reload --port {port}"
-            process = subprocess.Popen(cmd, shell=True)
-            processes.append(process)
+            env = dict(os.environ)
+            if metrics_dir:
+                env["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(metrics_dir, service)
+                os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+            processes.append(subprocess.Popen(cmd, cwd=service_dir, env=env))
             print(f"Started {service} on port {port}")
-            os.chdir(root_dir)  # Trở về thư mục gốc
-            time.sleep(1)  # Đợi 1 giây giữa việc khởi động các service
 
         # Khởi động API Documentation server
         print("\nStarting API Documentation server...")
-        os.chdir(root_dir)
-        api_docs_cmd = "uvicorn api_docs:app --reload --port 8000"
-        api_docs_process = subprocess.Popen(api_docs_cmd, shell=True)
-        processes.append(api_docs_process)
-        print("Started API Documentation server on port 8000")
+        cmd = uvicorn_command("api_docs:app", API_DOCS_PORT, args.prod, 1)
+        processes.append(subprocess.Popen(cmd, cwd=root_dir))
+
+        # Chờ các service kết nối DB xong thay vì sleep cố định
+        path = "/readyz" if args.prod else "/livez"
+        not_ready = wait_until_ready(
+            [(service, f"http://localhost:{port}{path}") for service, port in SERVICES],
+            args.startup_timeout,
+        )
+        if not_ready:
+            print(f"Services not ready after {args.startup_timeout}s: {not_ready}")
+            if args.prod:
+                stop_services(processes, args.drain, exit_code=1)
+
         print("\nYou can now access:")
-        print("- API Documentation: http://localhost:8000")
+        print(f"- API Documentation: http://localhost:{API_DOCS_PORT}")
         print("- Swagger UI for each service:")
-        for service, port in services:
+        for service, port in SERVICES:
             print(f"  - {service}: http://localhost:{port}/docs")
 
-        # Chờ cho đến khi có tín hiệu dừng
-        signal.signal(signal.SIGINT, lambda s, f: stop_services(processes))
-        signal.signal(signal.SIGTERM, lambda s, f: stop_services(processes))
-
         # Giữ script chạy
         for process in processes:
             process.wait()
 
+    except ShutdownRequested:
+        stop_services(processes, args.drain)
     except Exception as e:
         print(f"Error starting services: {e}")
-        stop_services(processes)
+        stop_services(processes, args.drain, exit_code=1)
+    finally:
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
 
 
-def stop_services(processes: List[subprocess.Popen]):
+def stop_services(processes: List[subprocess.Popen], drain: float, exit_code=0):
+    """Gửi SIGTERM để uvicorn ngừng nhận kết nối mới và xử lý nốt request đang
+    chạy, quá `drain` giây mới buộc dừng"""
     print("\nStopping all services...")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
     for process in processes:
         if process.poll() is None:  # Nếu process vẫn đang chạy
             process.terminate()
+
+    deadline = time.monotonic() + drain
+    for process in processes:
+        try:
+            process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
             process.wait()
     print("All services stopped successfully")
-    sys.exit(0)
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chạy tất cả các service")
+    parser.add_argument(
+        "--prod",
+        action="store_true",
+        help="Chạy nhiều worker, không reload, dùng uvloop/httptools nếu có",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", default_workers())),
+        help="Số worker mỗi service ở chế độ --prod",
+    )
+    parser.add_argument(
+        "--startup-timeout",
+        type=float,
+        default=60.0,
+        help="Số giây tối đa chờ các service sẵn sàng",
+    )
+    parser.add_argument(
+        "--drain",
+        type=float,
+        default=30.0,
+        help="Số giây chờ request đang xử lý hoàn tất khi dừng",
+    )
+    args = parser.parse_args()
+
     print("Starting Restaurant Management System...")
     print("Press Ctrl+C to stop all services\n")
-    run_services()
+    run_services(args)
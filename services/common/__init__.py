@@ -0,0 +1 @@
+# Initialize shared package for all services
@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from common.metrics import CacheMetrics
+
+
+class TTLCache:
+    """Cache trong tiến trình có giới hạn kích thước (LRU) và thời gian sống.
+
+    `generation` tăng mỗi lần xoá cache; truyền giá trị đọc được trước khi
+    truy vấn vào `set` để bỏ qua kết quả đã cũ do có ghi xen giữa. Cache có
+    `name` được đếm hit/miss trong `/metrics`.
+    """
+
+    def __init__(
+        self, maxsize: int = 256, ttl: float = 60.0, name: Optional[str] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.metrics = CacheMetrics(name) if name else None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            if self.metrics:
+                self.metrics.miss.inc()
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        if self.metrics:
+            self.metrics.hit.inc()
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        if generation is not None and generation != self.generation:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable):
+        self.generation += 1
+        for key in keys:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        self.generation += 1
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def clear(self):
+        self.generation += 1
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class CacheInvalidationBus:
+    """Phát lệnh xoá cache tới các worker khác qua Supabase Realtime broadcast.
+
+    `handler` nhận payload và xoá các khoá tương ứng trong cache cục bộ; mỗi
+    lệnh `publish` được áp dụng ngay tại worker hiện tại rồi mới gửi đi.
+    """
+
+    EVENT = "invalidate"
+
+    def __init__(self, db, topic: str, handler: Callable[[dict], None]):
+        self.db = db
+        self.topic = topic
+        self.handler = handler
+        self._channel = None
+
+    async def start(self):
+        try:
+            channel = self.db.client.channel(self.topic)
+            channel.on_broadcast(self.EVENT, self._on_message)
+            await channel.subscribe()
+            self._channel = channel
+        except Exception as e:
+            print(f"Cache invalidation bus '{self.topic}' disabled: {str(e)}")
+
+    async def stop(self):
+        if self._channel is not None:
+            await self._channel.unsubscribe()
+            self._channel = None
+
+    def _on_message(self, message: dict):
+        self.handler(message.get("payload", message))
+
+    async def publish(self, payload: dict):
+        self.handler(payload)
+        if self._channel is None:
+            return
+        try:
+            await self._channel.send_broadcast(self.EVENT, payload)
+        except Exception as e:
+            print(f"Failed to broadcast cache invalidation: {str(e)}")
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from supabase import AsyncClient, acreate_client
+
+from common.metrics import observe_db_call
+from common.timing import record_db_call
+
+# Số truy vấn tối đa được chạy đồng thời trên mỗi worker
+DEFAULT_MAX_CONCURRENCY = 10
+
+HTTP_OPERATIONS = {
+    "GET": "select",
+    "HEAD": "select",
+    "POST": "insert",
+    "PATCH": "update",
+    "DELETE": "delete",
+}
+
+# Mã lỗi khi stored function chưa được tạo (PostgREST không tìm thấy / PostgreSQL)
+MISSING_FUNCTION_CODES = ("PGRST202", "42883")
+
+
+def is_missing_function(error) -> bool:
+    """Chỉ lỗi này mới nên chuyển sang cách làm dự phòng ngoài database, các lỗi
+    khác (timeout, vi phạm ràng buộc...) phải trả về cho client"""
+    return getattr(error, "code", None) in MISSING_FUNCTION_CODES
+
+
+# Mã lỗi khi bảng chưa được tạo (PostgREST không tìm thấy / PostgreSQL)
+MISSING_RELATION_CODES = ("PGRST205", "42P01")
+
+
+def is_missing_relation(error) -> bool:
+    return getattr(error, "code", None) in MISSING_RELATION_CODES
+
+
+class Database:
+    """Lớp truy cập dữ liệu bất đồng bộ dùng chung cho các service.
+
+    Mọi truy vấn đều đi qua `execute`, nên I/O tới Supabase không chặn event
+    loop và số truy vấn đồng thời bị giới hạn bởi `max_concurrency`.
+    """
+
+    # Backend hỗ trợ gọi stored function qua rpc()
+    supports_rpc = True
+
+    # Các service chạy chung một tiến trình (monolith.py) dùng chung một client
+    _shared: Dict[tuple, "Database"] = {}
+
+    def __init__(
+        self, url: str, key: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ):
+        self.url = url
+        self.key = key
+        self.max_concurrency = max_concurrency
+        self._client: Optional[AsyncClient] = None
+        # Tạo trễ để semaphore gắn với event loop của server (Python 3.9)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_env(cls) -> "Database":
+        # DB_BACKEND=sqlite: chạy offline trên SQLite, xem common/local_db.py
+        if os.getenv("DB_BACKEND", "supabase") == "sqlite":
+            from common.local_db import LocalDatabase
+
+            return LocalDatabase.from_env()
+
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            raise Exception(
+                "Missing required environment variables: SUPABASE_URL and SUPABASE_KEY must be set"
+            )
+        max_concurrency = int(
+            os.getenv("DB_MAX_CONCURRENCY", str(DEFAULT_MAX_CONCURRENCY))
+        )
+        shared_key = (cls, url, key, max_concurrency)
+        if shared_key not in cls._shared:
+            cls._shared[shared_key] = cls(url, key, max_concurrency)
+        return cls._shared[shared_key]
+
+    async def connect(self):
+        if self._client is None:
+            self._client = await acreate_client(
+                supabase_url=self.url, supabase_key=self.key
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.postgrest.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> AsyncClient:
+        if self._client is None:
+            raise RuntimeError("Database is not connected, call connect() on startup")
+        return self._client
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None):
+        return self.client.rpc(fn, params or {})
+
+    def describe(self, query) -> Tuple[str, str]:
+        """(bảng, thao tác) của một query builder postgrest, dùng để đo thời gian"""
+        # postgrest >= 0.17 giữ method/path trong query.request
+        request = getattr(query, "request", query)
+        method = getattr(request, "http_method", "GET")
+        parts = str(getattr(request, "path", "")).rstrip("/").split("/")
+        if len(parts) >= 2 and parts[-2] == "rpc":
+            return parts[-1], "rpc"
+        op = HTTP_OPERATIONS.get(method, method.lower())
+        if op == "insert" and "merge-duplicates" in str(
+            getattr(request, "headers", "")
+        ):
+            op = "upsert"
+        return parts[-1] or "unknown", op
+
+    async def execute(self, query) -> Any:
+        """Chạy một query builder, chờ nếu đã đạt giới hạn đồng thời"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        queued = time.perf_counter()
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                return await query.execute()
+            finally:
+                elapsed = time.perf_counter() - start
+                table, op = self.describe(query)
+                record_db_call(table, op, elapsed, wait=start - queued)
+                observe_db_call(table, op, elapsed)
@@ -0,0 +1,60 @@
+import csv
+import io
+from typing import AsyncIterator, Callable, List
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from common.pagination import MAX_PAGE_SIZE, page_result, paginate
+from common.responses import dumps
+
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+async def iter_pages(db, build_query: Callable) -> AsyncIterator[List[dict]]:
+    """Duyệt toàn bộ kết quả theo từng trang keyset (created_at, id) tăng dần"""
+    cursor = None
+    while True:
+        query = paginate(build_query(), cursor, MAX_PAGE_SIZE, descending=False)
+        response = await db.execute(query)
+        rows, cursor = page_result(response.data, MAX_PAGE_SIZE)
+        if rows:
+            yield rows
+        if cursor is None:
+            break
+
+
+async def _encode_csv(pages: AsyncIterator[List[dict]], columns: List[str]):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    # Gửi header ngay để client nhận byte đầu tiên trước khi truy vấn xong
+    yield buffer.getvalue().encode("utf-8")
+    async for rows in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _encode_ndjson(pages: AsyncIterator[List[dict]]):
+    async for rows in pages:
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def stream_export(
+    db, build_query: Callable, columns: List[str], fmt: str, filename: str
+) -> StreamingResponse:
+    """Trả về StreamingResponse CSV/NDJSON, bộ nhớ không phụ thuộc số dòng"""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Định dạng không hợp lệ. Chọn một trong: {', '.join(EXPORT_FORMATS)}",
+        )
+    pages = iter_pages(db, build_query)
+    body = _encode_csv(pages, columns) if fmt == "csv" else _encode_ndjson(pages)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
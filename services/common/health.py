@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional, Sequence
+
+from fastapi import HTTPException
+
+
+def _percentile(ordered: Sequence[float], pct: float) -> float:
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+class HealthProbe:
+    """Kiểm tra kết nối DB định kỳ ở nền thay vì trong mỗi request health check.
+
+    `/readyz` (và `/health`) chỉ đọc kết quả lần kiểm tra gần nhất; kết quả cũ
+    hơn `3 * interval` bị coi là không sẵn sàng để không che giấu vòng kiểm tra
+    bị treo.
+    """
+
+    def __init__(
+        self,
+        db,
+        service: str,
+        tables: Sequence[str],
+        interval: Optional[float] = None,
+        window: int = 60,
+    ):
+        self.db = db
+        self.service = service
+        self.tables = list(tables)
+        self.interval = interval or float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+        self.started_at = time.monotonic()
+        self.latencies: "deque[float]" = deque(maxlen=window)
+        self.last_checked: Optional[float] = None
+        self.last_timestamp: Optional[str] = None
+        self.last_error: Optional[str] = "Chưa thực hiện lần kiểm tra nào"
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.probe()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.probe()
+
+    async def probe(self):
+        start = time.perf_counter()
+        try:
+            for table in self.tables:
+                await self.db.execute(self.db.table(table).select("count").limit(1))
+            self.latencies.append((time.perf_counter() - start) * 1000)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+        self.last_checked = time.monotonic()
+        self.last_timestamp = datetime.now().isoformat()
+
+    def liveness(self) -> dict:
+        return {
+            "status": "alive",
+            "service": self.service,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+        }
+
+    def readiness(self) -> dict:
+        """Kết quả kiểm tra gần nhất, raise 503 nếu DB lỗi hoặc kết quả đã quá cũ"""
+        error = self.last_error
+        if error is None and time.monotonic() - self.last_checked > 3 * self.interval:
+            error = "Kết quả kiểm tra đã quá cũ"
+        if error is not None:
+            raise HTTPException(
+                status_code=503,
+                detail={
+                    "status": "unhealthy",
+                    "database": "disconnected",
+                    "error": error,
+                    "timestamp": self.last_timestamp or datetime.now().isoformat(),
+                    "service": self.service,
+                },
+            )
+
+        ordered = sorted(self.latencies)
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "response_time_ms": round(self.latencies[-1], 2),
+            "timestamp": self.last_timestamp,
+            "service": self.service,
+            "tables_checked": self.tables,
+            "probe_interval_seconds": self.interval,
+            "probe_latency_ms": {
+                "p50": _percentile(ordered, 50),
+                "p95": _percentile(ordered, 95),
+                "p99": _percentile(ordered, 99),
+                "samples": len(ordered),
+            },
+        }
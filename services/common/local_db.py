@@ -0,0 +1,643 @@
+"""Backend SQLite thay cho Supabase khi chạy offline (benchmark, load test).
+
+Chọn bằng `DB_BACKEND=sqlite`. Schema được dựng từ db.sql (bỏ các hàm và
+trigger của PostgreSQL), dữ liệu nằm trong file `LOCAL_DB_PATH` (mặc định
+local.db ở thư mục gốc) để các service chạy ở nhiều tiến trình dùng chung.
+
+Chỉ hỗ trợ phần query builder mà các service đang dùng: select (kể cả
+embedded select như `ingredient_id(*)`), insert/update/upsert/delete, các bộ
+lọc eq/neq/gt/gte/lt/lte/in_/like/ilike/is_, or_, order, limit, single.
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from common.db import DEFAULT_MAX_CONCURRENCY, Database
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NOW = "(strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))"
+
+# Trigger của PostgreSQL được viết lại cho SQLite
+SQLITE_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_bills_daily_revenue
+AFTER INSERT ON bills
+BEGIN
+    INSERT INTO daily_revenue (date, payment_method, total_amount, total_bills)
+    VALUES (date(NEW.created_at), NEW.payment_method, NEW.total_amount, 1)
+    ON CONFLICT (date, payment_method) DO UPDATE
+    SET total_amount = total_amount + excluded.total_amount,
+        total_bills = total_bills + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_order_items_counters_insert
+AFTER INSERT ON order_items
+BEGIN
+    UPDATE orders
+    SET total_amount = total_amount + NEW.price * NEW.quantity,
+        items_total = items_total + 1,
+        items_completed = items_completed + (NEW.status = 'completed')
+    WHERE id = NEW.order_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_order_items_counters_delete
+AFTER DELETE ON order_items
+BEGIN
+    UPDATE orders
+    SET total_amount = total_amount - OLD.price * OLD.quantity,
+        items_total = items_total - 1,
+        items_completed = items_completed - (OLD.status = 'completed')
+    WHERE id = OLD.order_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_order_items_counters_update
+AFTER UPDATE OF order_id, quantity, price, status ON order_items
+BEGIN
+    UPDATE orders
+    SET total_amount = total_amount - OLD.price * OLD.quantity,
+        items_total = items_total - 1,
+        items_completed = items_completed - (OLD.status = 'completed')
+    WHERE id = OLD.order_id;
+    UPDATE orders
+    SET total_amount = total_amount + NEW.price * NEW.quantity,
+        items_total = items_total + 1,
+        items_completed = items_completed + (NEW.status = 'completed')
+    WHERE id = NEW.order_id;
+END;
+"""
+
+OPERATORS = {
+    "eq": "=",
+    "neq": "<>",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+    "like": "LIKE",
+    "ilike": "LIKE",
+}
+
+SQLITE_ERRORS = [
+    (
+        "UNIQUE constraint failed",
+        "23505",
+        "duplicate key value violates unique constraint",
+    ),
+    (
+        "FOREIGN KEY constraint failed",
+        "23503",
+        "insert or update violates foreign key constraint",
+    ),
+    ("NOT NULL constraint failed", "23502", "null value violates not-null constraint"),
+]
+
+
+def translate_schema(sql: str) -> str:
+    """Chuyển db.sql (PostgreSQL) thành DDL chạy được trên SQLite"""
+    sql = re.sub(r"--[^\n]*", "", sql)
+    sql = re.sub(r"CREATE OR REPLACE FUNCTION.*?\$\$.*?\$\$;", "", sql, flags=re.S)
+    sql = re.sub(r"(DROP|CREATE) TRIGGER[^;]*;", "", sql)
+    sql = re.sub(r"DROP TABLE[^;]*;", "", sql)
+    sql = sql.replace("BIGSERIAL PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+    sql = re.sub(r"TIMESTAMPTZ DEFAULT NOW\(\)", f"TEXT DEFAULT {NOW}", sql)
+    sql = sql.replace("TIMESTAMPTZ", "TEXT")
+    sql = re.sub(r"DECIMAL\(\d+,\s*\d+\)", "REAL", sql)
+    return sql + SQLITE_TRIGGERS
+
+
+def parse_foreign_keys(sql: str) -> Dict[str, Dict[str, Tuple[str, str]]]:
+    """{bảng: {cột: (bảng được tham chiếu, cột được tham chiếu)}}"""
+    foreign_keys: Dict[str, Dict[str, Tuple[str, str]]] = {}
+    for table, body in re.findall(
+        r"CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\);", sql, flags=re.S
+    ):
+        foreign_keys[table] = {
+            column: (ref_table, ref_column)
+            for column, ref_table, ref_column in re.findall(
+                r"^\s*(\w+) [^,\n]*REFERENCES (\w+)\((\w+)\)", body, flags=re.M
+            )
+        }
+    return foreign_keys
+
+
+def split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Tách theo dấu phân cách nằm ngoài ngoặc và ngoài chuỗi trong nháy kép"""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == sep and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def to_sql_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class LocalResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class LocalClient:
+    """Một kết nối SQLite cho mỗi tiến trình, tạo schema nếu file còn trống.
+
+    Truy vấn chạy trong thread pool (xem `LocalQuery.execute`), `lock` đảm bảo
+    mỗi lúc chỉ một truy vấn/transaction dùng kết nối.
+    """
+
+    def __init__(self, path: str, schema_path: str):
+        with open(schema_path, encoding="utf-8") as f:
+            schema = f.read()
+        self.foreign_keys = parse_foreign_keys(schema)
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA busy_timeout = 5000")
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(translate_schema(schema))
+        self.columns = {
+            table: [
+                row["name"]
+                for row in self.conn.execute(f'PRAGMA table_info("{table}")')
+            ]
+            for table in self.foreign_keys
+        }
+        self.primary_keys = {
+            table: [
+                row["name"]
+                for row in sorted(
+                    self.conn.execute(f'PRAGMA table_info("{table}")'),
+                    key=lambda row: row["pk"],
+                )
+                if row["pk"]
+            ]
+            for table in self.foreign_keys
+        }
+
+    def table(self, name: str) -> "LocalQuery":
+        if name not in self.columns:
+            raise APIError(
+                {
+                    "message": f'relation "public.{name}" does not exist',
+                    "code": "42P01",
+                    "details": None,
+                    "hint": None,
+                }
+            )
+        return LocalQuery(self, name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None):
+        raise APIError(
+            {
+                "message": f"Could not find the function public.{fn}",
+                "code": "PGRST202",
+                "details": "Stored functions are not available on the local backend",
+                "hint": None,
+            }
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+class LocalQuery:
+    """Query builder có cùng giao diện với postgrest-py cho một bảng SQLite"""
+
+    def __init__(self, client: LocalClient, table: str):
+        self.client = client
+        self.table = table
+        self.method = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.on_conflict: Optional[str] = None
+        self.where: List[str] = []
+        self.params: List[Any] = []
+        self.order_by: List[str] = []
+        self.row_limit: Optional[int] = None
+        self.single_row = False
+        self.maybe_single_row = False
+
+    # Loại truy vấn
+
+    def select(self, *columns: str, count: Optional[str] = None) -> "LocalQuery":
+        self.columns = ",".join(columns) or "*"
+        return self
+
+    def insert(self, json: Any, **kwargs) -> "LocalQuery":
+        self.method = "insert"
+        self.payload = json
+        return self
+
+    def upsert(self, json: Any, on_conflict: str = "", **kwargs) -> "LocalQuery":
+        self.method = "upsert"
+        self.payload = json
+        self.on_conflict = on_conflict or None
+        return self
+
+    def update(self, json: dict, **kwargs) -> "LocalQuery":
+        self.method = "update"
+        self.payload = json
+        return self
+
+    def delete(self, **kwargs) -> "LocalQuery":
+        self.method = "delete"
+        return self
+
+    # Bộ lọc
+
+    def _column(self, column: str) -> str:
+        if column not in self.client.columns[self.table]:
+            raise APIError(
+                {
+                    "message": f"column {self.table}.{column} does not exist",
+                    "code": "42703",
+                    "details": None,
+                    "hint": None,
+                }
+            )
+        return f'"{column}"'
+
+    def _condition(self, column: str, op: str, value: Any) -> Tuple[str, List[Any]]:
+        name = self._column(column)
+        if op == "in":
+            values = [to_sql_value(v) for v in value]
+            if not values:
+                return "0", []
+            return f"{name} IN ({','.join('?' * len(values))})", values
+        if op == "is":
+            keyword = {None: "NULL", "null": "NULL", True: "TRUE", "true": "TRUE"}
+            return f"{name} IS {keyword.get(value, 'FALSE')}", []
+        if op == "ilike":
+            return f"{name} LIKE ? COLLATE NOCASE", [str(value).replace("*", "%")]
+        if op == "like":
+            return f"{name} LIKE ?", [str(value).replace("*", "%")]
+        return f"{name} {OPERATORS[op]} ?", [to_sql_value(value)]
+
+    def _filter(self, column: str, op: str, value: Any) -> "LocalQuery":
+        condition, params = self._condition(column, op, value)
+        self.where.append(condition)
+        self.params.extend(params)
+        return self
+
+    def eq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "lte", value)
+
+    def like(self, column: str, pattern: str) -> "LocalQuery":
+        return self._filter(column, "like", pattern)
+
+    def ilike(self, column: str, pattern: str) -> "LocalQuery":
+        return self._filter(column, "ilike", pattern)
+
+    def is_(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, "is", value)
+
+    def in_(self, column: str, values) -> "LocalQuery":
+        return self._filter(column, "in", list(values))
+
+    def or_(self, filters: str, **kwargs) -> "LocalQuery":
+        condition, params = self._logic("or", filters)
+        self.where.append(condition)
+        self.params.extend(params)
+        return self
+
+    def _logic(self, operator: str, filters: str) -> Tuple[str, List[Any]]:
+        """Dịch bộ lọc logic của PostgREST, vd. `a.lt."x",and(a.eq."x",b.lt.1)`"""
+        conditions, params = [], []
+        for part in split_top_level(filters):
+            match = re.fullmatch(r"(and|or)\((.*)\)", part, flags=re.S)
+            if match:
+                condition, values = self._logic(match.group(1), match.group(2))
+            else:
+                column, op, raw = part.split(".", 2)
+                if op == "in":
+                    value = [v.strip('"') for v in split_top_level(raw[1:-1])]
+                else:
+                    value = raw[1:-1] if raw.startswith('"') else raw
+                condition, values = self._condition(column, op, value)
+            conditions.append(condition)
+            params.extend(values)
+        return "(" + f" {operator.upper()} ".join(conditions) + ")", params
+
+    # Sắp xếp, giới hạn
+
+    def order(self, column: str, desc: bool = False, **kwargs) -> "LocalQuery":
+        self.order_by.append(f"{self._column(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int, **kwargs) -> "LocalQuery":
+        self.row_limit = size
+        return self
+
+    def single(self) -> "LocalQuery":
+        self.single_row = True
+        return self
+
+    def maybe_single(self) -> "LocalQuery":
+        self.maybe_single_row = True
+        return self
+
+    # Thực thi
+
+    def _where_sql(self) -> str:
+        return f" WHERE {' AND '.join(self.where)}" if self.where else ""
+
+    def _rows_by_rowid(self, rowids: List[int]) -> List[dict]:
+        if not rowids:
+            return []
+        cursor = self.client.conn.execute(
+            f'SELECT * FROM "{self.table}" WHERE rowid IN '
+            f"({','.join('?' * len(rowids))}) ORDER BY rowid",
+            rowids,
+        )
+        return [dict(row) for row in cursor]
+
+    def _select_rows(self) -> List[dict]:
+        sql = f'SELECT * FROM "{self.table}"{self._where_sql()}'
+        if self.order_by:
+            sql += " ORDER BY " + ", ".join(self.order_by)
+        if self.row_limit is not None:
+            sql += f" LIMIT {int(self.row_limit)}"
+        return [dict(row) for row in self.client.conn.execute(sql, self.params)]
+
+    def _matching_rowids(self) -> List[int]:
+        cursor = self.client.conn.execute(
+            f'SELECT rowid FROM "{self.table}"{self._where_sql()}', self.params
+        )
+        return [row[0] for row in cursor]
+
+    def _write_rows(self) -> List[dict]:
+        conn = self.client.conn
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        rowids = []
+        for row in rows:
+            columns = [self._column(column) for column in row]
+            values = [to_sql_value(value) for value in row.values()]
+            sql = (
+                f'INSERT INTO "{self.table}" ({", ".join(columns)}) '
+                f"VALUES ({', '.join('?' * len(values))})"
+            )
+            conflict = (
+                self.on_conflict.split(",")
+                if self.on_conflict
+                else self.client.primary_keys[self.table]
+            )
+            conflict = [column.strip() for column in conflict]
+            if self.method == "upsert" and all(column in row for column in conflict):
+                updates = [c for c in row if c not in conflict]
+                action = (
+                    "DO UPDATE SET "
+                    + ", ".join(f'"{c}" = excluded."{c}"' for c in updates)
+                    if updates
+                    else "DO NOTHING"
+                )
+                conn.execute(
+                    sql
+                    + f" ON CONFLICT ({', '.join(map(self._column, conflict))}) {action}",
+                    values,
+                )
+                where = " AND ".join(f"{self._column(c)} = ?" for c in conflict)
+                found = conn.execute(
+                    f'SELECT rowid FROM "{self.table}" WHERE {where}',
+                    [to_sql_value(row[c]) for c in conflict],
+                ).fetchone()
+                rowids.append(found[0])
+            else:
+                rowids.append(conn.execute(sql, values).lastrowid)
+        return self._rows_by_rowid(rowids)
+
+    def _run(self) -> List[dict]:
+        conn = self.client.conn
+        if self.method == "select":
+            return self._select_rows()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.method in ("insert", "upsert"):
+                rows = self._write_rows()
+            elif self.method == "update":
+                rowids = self._matching_rowids()
+                assignments = [f"{self._column(c)} = ?" for c in self.payload]
+                if rowids:
+                    conn.execute(
+                        f'UPDATE "{self.table}" SET {", ".join(assignments)} '
+                        f"WHERE rowid IN ({','.join('?' * len(rowids))})",
+                        [to_sql_value(v) for v in self.payload.values()] + rowids,
+                    )
+                rows = self._rows_by_rowid(rowids)
+            else:
+                rowids = self._matching_rowids()
+                rows = self._rows_by_rowid(rowids)
+                if rowids:
+                    conn.execute(
+                        f'DELETE FROM "{self.table}" '
+                        f"WHERE rowid IN ({','.join('?' * len(rowids))})",
+                        rowids,
+                    )
+            conn.execute("COMMIT")
+            return rows
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _project(self, table: str, rows: List[dict], columns: str) -> List[dict]:
+        """Chọn cột và nối các bảng liên quan theo cú pháp select của PostgREST"""
+        items = split_top_level(columns)
+        if items == ["count"]:
+            return [{"count": len(rows)}]
+
+        result = [{} for _ in rows]
+        for item in items:
+            match = re.fullmatch(r"(?:(\w+):)?(\w+)(?:!\w+)?\((.*)\)", item, flags=re.S)
+            if match:
+                alias, name, sub_columns = match.groups()
+                embedded = self._embed(table, rows, name, sub_columns)
+                for target, value in zip(result, embedded):
+                    target[alias or name] = value
+            elif item == "*":
+                for target, row in zip(result, rows):
+                    target.update(row)
+            else:
+                alias, _, name = item.rpartition(":")
+                for target, row in zip(result, rows):
+                    target[alias or name] = row[name]
+        return result
+
+    def _embed(self, table: str, rows: List[dict], name: str, columns: str) -> list:
+        conn = self.client.conn
+        foreign_keys = self.client.foreign_keys
+
+        def fetch(other: str, column: str, values: list) -> List[dict]:
+            values = list({v for v in values if v is not None})
+            if not values:
+                return []
+            cursor = conn.execute(
+                f'SELECT * FROM "{other}" WHERE "{column}" IN '
+                f"({','.join('?' * len(values))})",
+                values,
+            )
+            return [dict(row) for row in cursor]
+
+        def to_one(fk_column: str, other: str, other_column: str) -> list:
+            found = fetch(other, other_column, [row[fk_column] for row in rows])
+            projected = self._project(other, found, columns)
+            by_key = {row[other_column]: p for row, p in zip(found, projected)}
+            return [by_key.get(row[fk_column]) for row in rows]
+
+        # Nhúng qua tên cột khoá ngoại, vd. item_ingredients.select("*,ingredient_id(*)")
+        if name in foreign_keys.get(table, {}):
+            return to_one(name, *foreign_keys[table][name])
+        # Bảng cha được tham chiếu từ bảng hiện tại
+        for column, (other, other_column) in foreign_keys.get(table, {}).items():
+            if other == name:
+                return to_one(column, other, other_column)
+        # Bảng con tham chiếu tới bảng hiện tại
+        for column, (other, other_column) in foreign_keys.get(name, {}).items():
+            if other == table:
+                found = fetch(name, column, [row[other_column] for row in rows])
+                projected = self._project(name, found, columns)
+                grouped: Dict[Any, list] = {}
+                for row, p in zip(found, projected):
+                    grouped.setdefault(row[column], []).append(p)
+                return [grouped.get(row[other_column], []) for row in rows]
+        raise APIError(
+            {
+                "message": f"Could not find a relationship between '{table}' and '{name}'",
+                "code": "PGRST200",
+                "details": None,
+                "hint": None,
+            }
+        )
+
+    async def execute(self) -> LocalResponse:
+        # sqlite3 chặn cả thread khi chờ khoá ghi của tiến trình khác (tới
+        # busy_timeout), nên không chạy trực tiếp trên event loop
+        return await asyncio.to_thread(self._execute)
+
+    def _execute(self) -> LocalResponse:
+        with self.client.lock:
+            return self._execute_locked()
+
+    def _execute_locked(self) -> LocalResponse:
+        try:
+            rows = self._run()
+        except sqlite3.IntegrityError as e:
+            for marker, code, message in SQLITE_ERRORS:
+                if marker in str(e):
+                    raise APIError(
+                        {
+                            "message": message,
+                            "code": code,
+                            "details": str(e),
+                            "hint": None,
+                        }
+                    )
+            raise
+
+        if self.method == "select" or self.columns != "*":
+            rows = self._project(self.table, rows, self.columns)
+        if self.single_row or self.maybe_single_row:
+            if len(rows) == 1:
+                return LocalResponse(rows[0])
+            if self.maybe_single_row and not rows:
+                return LocalResponse(None)
+            raise APIError(
+                {
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "code": "PGRST116",
+                    "details": f"The result contains {len(rows)} rows",
+                    "hint": None,
+                }
+            )
+        return LocalResponse(rows, len(rows))
+
+
+class LocalDatabase(Database):
+    """Database dùng LocalClient thay cho Supabase, cùng giao diện table/execute"""
+
+    supports_rpc = False
+
+    _clients: Dict[str, LocalClient] = {}
+
+    def __init__(
+        self,
+        path: str,
+        schema_path: str,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ):
+        super().__init__(f"sqlite:///{path}", "", max_concurrency)
+        self.path = path
+        self.schema_path = schema_path
+
+    @classmethod
+    def from_env(cls) -> "LocalDatabase":
+        path = os.getenv("LOCAL_DB_PATH", os.path.join(ROOT_DIR, "local.db"))
+        schema_path = os.getenv("LOCAL_DB_SCHEMA", os.path.join(ROOT_DIR, "db.sql"))
+        max_concurrency = int(
+            os.getenv("DB_MAX_CONCURRENCY", str(DEFAULT_MAX_CONCURRENCY))
+        )
+        shared_key = (cls, path)
+        if shared_key not in cls._shared:
+            cls._shared[shared_key] = cls(path, schema_path, max_concurrency)
+        return cls._shared[shared_key]
+
+    async def connect(self):
+        if self._client is None:
+            if self.path not in self._clients:
+                self._clients[self.path] = LocalClient(self.path, self.schema_path)
+            self._client = self._clients[self.path]
+
+    def describe(self, query: LocalQuery) -> Tuple[str, str]:
+        return query.table, query.method
+
+    async def close(self):
+        # Kết nối được giữ lại cho các Database khác cùng file trong tiến trình
+        self._client = None
@@ -0,0 +1,187 @@
+"""Metrics dạng Prometheus cho các service.
+
+Khi chạy nhiều worker, đặt PROMETHEUS_MULTIPROC_DIR (thư mục rỗng, riêng cho
+mỗi service) trước khi khởi động: mỗi worker ghi giá trị ra file trong thư mục
+đó và `/metrics` của bất kỳ worker nào cũng trả về số liệu đã gộp.
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from common.timing import route_template
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv(
+    "prometheus_multiproc_dir"
+)
+
+# Bucket (giây) cho request và truy vấn DB, từ 1 ms tới 10 s
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Thời gian xử lý request theo route template và status",
+    ["service", "method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Số request đang được xử lý (tới khi bắt đầu trả response)",
+    ["service"],
+    multiprocess_mode="livesum",
+)
+RESPONSES_STREAMING = Gauge(
+    "http_responses_streaming",
+    "Số response dạng stream đang gửi (SSE, xuất CSV)",
+    ["service"],
+    multiprocess_mode="livesum",
+)
+DB_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Thời gian mỗi truy vấn DB theo bảng và thao tác",
+    ["table", "op"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Số lần đọc cache theo kết quả (hit/miss)",
+    ["cache", "result"],
+)
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Độ trễ của event loop so với lịch hẹn giờ",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+
+def observe_db_call(table: str, op: str, seconds: float):
+    DB_LATENCY.labels(table, op).observe(seconds)
+
+
+class CacheMetrics:
+    """Đếm hit/miss của một cache; tỉ lệ hit tính bằng PromQL"""
+
+    def __init__(self, cache: str):
+        self.hit = CACHE_REQUESTS.labels(cache, "hit")
+        self.miss = CACHE_REQUESTS.labels(cache, "miss")
+
+
+class MetricsMiddleware:
+    """Ghi histogram độ trễ và số request đang chạy cho mọi request HTTP"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+        self.in_flight = REQUESTS_IN_FLIGHT.labels(service)
+        self.streaming = RESPONSES_STREAMING.labels(service)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        in_flight = True
+        streaming = False
+
+        async def send_with_status(message):
+            nonlocal status, in_flight, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Request được tính là đang chạy tới khi bắt đầu trả response,
+                # để stream mở lâu (màn hình bếp, xuất CSV) không làm lệch gauge
+                self.in_flight.dec()
+                in_flight = False
+            elif (
+                message["type"] == "http.response.body"
+                and message.get("more_body")
+                and not streaming
+            ):
+                self.streaming.inc()
+                streaming = True
+            await send(message)
+
+        start = time.perf_counter()
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if in_flight:
+                self.in_flight.dec()
+            if streaming:
+                self.streaming.dec()
+            REQUEST_LATENCY.labels(
+                self.service, scope["method"], route_template(scope), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+class LoopLagMonitor:
+    """Ngủ `interval` giây liên tục và ghi lại phần ngủ quá giờ: event loop bị
+    chặn bởi code đồng bộ thì phần quá giờ này tăng lên"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if MULTIPROC_DIR:
+            # Bỏ các gauge "live" của worker này khỏi số liệu gộp
+            multiprocess.mark_process_dead(os.getpid())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - scheduled))
+
+
+# Một monitor cho cả tiến trình, kể cả khi nhiều service chạy chung (monolith.py)
+loop_monitor = LoopLagMonitor()
+
+
+def metrics_response() -> Response:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,95 @@
+import base64
+import json
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+# Giới hạn cứng phía server, client yêu cầu lớn hơn sẽ bị cắt về giá trị này
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+# Ký tự có nghĩa trong bộ lọc logic của PostgREST, không được xuất hiện trong cursor
+FILTER_CHARS = set('",()')
+
+# Timestamp ISO 8601 như PostgREST/SQLite trả về. Không dùng datetime.fromisoformat
+# vì trước Python 3.11 hàm này không nhận phần lẻ giây đã bị bỏ số 0 ở cuối
+# (vd. 10:00:30.1234+00:00)
+TIMESTAMP_RE = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d{1,6})?(Z|[+-]\d{2}(:?\d{2})?)?"
+)
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def valid_cursor_value(key: str, value) -> bool:
+    """Giá trị cursor phải đúng kiểu của khoá: số nguyên cho id, chuỗi thời
+    gian ISO cho created_at"""
+    if key == "id":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if not isinstance(value, str) or FILTER_CHARS.intersection(value):
+        return False
+    if key == "created_at":
+        return TIMESTAMP_RE.fullmatch(value) is not None
+    return True
+
+
+def decode_cursor(cursor: str, keys: Tuple[str, ...]) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+    # Cursor do client gửi lại nên có thể bị sửa: giá trị được ghép vào chuỗi
+    # bộ lọc, phải kiểm tra kiểu trước khi dùng
+    if (
+        not isinstance(values, list)
+        or len(values) != len(keys)
+        or not all(valid_cursor_value(k, v) for k, v in zip(keys, values))
+    ):
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
+    return values
+
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate(
+    query,
+    cursor: Optional[str],
+    limit: int,
+    keys: Tuple[str, ...] = ("created_at", "id"),
+    descending: bool = True,
+):
+    """Áp dụng phân trang keyset (mặc định giảm dần theo `keys`) lên một select query.
+
+    Lấy dư một dòng để biết còn trang sau hay không, xem `page_result`.
+    """
+    op = "lt" if descending else "gt"
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        if len(keys) == 1:
+            query = getattr(query, op)(keys[0], values[0])
+        else:
+            # (k1, k2) < (v1, v2) viết dưới dạng bộ lọc logic của PostgREST
+            (k1, k2), (v1, v2) = keys, values
+            query = query.or_(f'{k1}.{op}."{v1}",and({k1}.eq."{v1}",{k2}.{op}.{v2})')
+    for key in keys:
+        query = query.order(key, desc=descending)
+    return query.limit(page_size(limit) + 1)
+
+
+def page_result(
+    rows: List[dict], limit: int, keys: Tuple[str, ...] = ("created_at", "id")
+) -> Tuple[List[dict], Optional[str]]:
+    """Cắt về đúng kích thước trang và tạo next_cursor từ dòng cuối cùng"""
+    size = page_size(limit)
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor([rows[-1][key] for key in keys])
@@ -0,0 +1,56 @@
+import json
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+from time import perf_counter
+from typing import Any, Callable, Dict
+
+from fastapi.responses import JSONResponse
+
+from common.timing import record_serialize
+
+try:
+    import orjson
+except ImportError:  # orjson là tuỳ chọn, thiếu thì dùng thư viện chuẩn
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_stdlib(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
+
+def dumps_orjson(content: Any) -> bytes:
+    # orjson ghi thẳng ra bytes UTF-8 và tự xử lý datetime
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {"json": dumps_stdlib}
+if orjson is not None:
+    ENCODERS["orjson"] = dumps_orjson
+
+# Chọn encoder qua biến môi trường JSON_ENCODER, mặc định encoder nhanh nhất có sẵn
+dumps = ENCODERS.get(os.getenv("JSON_ENCODER", "orjson"), dumps_stdlib)
+
+
+# Tùy chỉnh JSONResponse để xử lý Unicode
+class UnicodeJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        start = perf_counter()
+        body = dumps(content)
+        record_serialize(perf_counter() - start)
+        return body
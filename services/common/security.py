@@ -0,0 +1,131 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+from pydantic import BaseModel
+
+from common.cache import TTLCache
+
+ALGORITHM = "HS256"
+
+
+# Cấu hình bảo mật được đọc khi dùng, không đọc lúc import: các service import
+# module này trước khi gọi load_dotenv()
+def secret_key() -> str:
+    """SECRET_KEY dùng chung với user-service, không có giá trị mặc định"""
+    key = os.getenv("SECRET_KEY")
+    if not key:
+        raise RuntimeError("SECRET_KEY chưa được đặt (biến môi trường hoặc file .env)")
+    return key
+
+
+def access_token_expire_minutes() -> int:
+    return int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "480"))
+
+
+def check_settings():
+    """Startup hook: không cho service khởi động khi thiếu SECRET_KEY"""
+    secret_key()
+
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+class TokenUser(BaseModel):
+    id: int
+    username: str
+    role: str
+    exp: float
+
+
+def create_access_token(user: dict, expires_delta: Optional[timedelta] = None) -> str:
+    expire = datetime.utcnow() + (
+        expires_delta or timedelta(minutes=access_token_expire_minutes())
+    )
+    claims = {
+        "sub": str(user["id"]),
+        "username": user["username"],
+        "role": user["role"],
+        "exp": expire,
+    }
+    return jwt.encode(claims, secret_key(), algorithm=ALGORITHM)
+
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+class TokenVerifier:
+    """Xác thực JWT ngay trong tiến trình, không gọi sang user-service hay DB.
+
+    Token đã kiểm tra chữ ký được giữ trong một LRU nhỏ; mỗi lần dùng lại vẫn
+    so hạn `exp` nên token hết hạn không bao giờ được chấp nhận từ cache.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: Optional[TTLCache] = None
+
+    @property
+    def cache(self) -> TTLCache:
+        # Tạo khi xác thực token đầu tiên để đọc TOKEN_CACHE_* sau load_dotenv()
+        if self._cache is None:
+            self._cache = TTLCache(
+                maxsize=self.maxsize or int(os.getenv("TOKEN_CACHE_SIZE", "1024")),
+                ttl=self.ttl or float(os.getenv("TOKEN_CACHE_TTL", "300")),
+                name="token",
+            )
+        return self._cache
+
+    def verify(self, token: str) -> TokenUser:
+        user = self.cache.get(token)
+        if user is None:
+            try:
+                payload = jwt.decode(token, secret_key(), algorithms=[ALGORITHM])
+                user = TokenUser(
+                    id=int(payload["sub"]),
+                    username=payload["username"],
+                    role=payload["role"],
+                    exp=payload["exp"],
+                )
+            except (JWTError, KeyError, ValueError):
+                raise _unauthorized()
+            self.cache.set(token, user)
+        if user.exp <= time.time():
+            self.cache.invalidate(token)
+            raise _unauthorized()
+        return user
+
+
+token_verifier = TokenVerifier()
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> TokenUser:
+    if credentials is None:
+        raise _unauthorized()
+    return token_verifier.verify(credentials.credentials)
+
+
+def require_roles(*roles: str):
+    """Dependency chỉ cho phép người dùng có một trong các role đã cho"""
+
+    async def dependency(user: TokenUser = Depends(get_current_user)) -> TokenUser:
+        if user.role not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Không có quyền thực hiện thao tác này",
+            )
+        return user
+
+    return dependency
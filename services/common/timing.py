@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# Chỉ ghi log các request chậm hơn ngưỡng này (ms), 0 = ghi tất cả
+LOG_MIN_MS = float(os.getenv("TIMING_LOG_MIN_MS", "0"))
+
+logger = logging.getLogger("restaurant.timing")
+if not logger.handlers:
+    # Mỗi dòng log là một object JSON, không qua cấu hình log của uvicorn
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.getenv("TIMING_LOG_LEVEL", "INFO"))
+    logger.propagate = False
+
+
+class RequestTiming:
+    """Thời gian đã dùng trong một request, gom theo (bảng, thao tác)"""
+
+    __slots__ = ("start", "db", "db_wait", "serialize")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # (table, op) -> [số lần gọi, tổng giây]
+        self.db: Dict[Tuple[str, str], list] = {}
+        self.db_wait = 0.0
+        self.serialize = 0.0
+
+    @property
+    def db_calls(self) -> int:
+        return sum(count for count, _ in self.db.values())
+
+    @property
+    def db_seconds(self) -> float:
+        return sum(seconds for _, seconds in self.db.values())
+
+    def header(self, total: float) -> str:
+        """Giá trị header Server-Timing, thời gian tính bằng ms"""
+        metrics = [f"total;dur={total * 1000:.2f}"]
+        app = total - self.db_seconds - self.db_wait - self.serialize
+        metrics.append(f"app;dur={max(app, 0.0) * 1000:.2f}")
+        for (table, op), (count, seconds) in self.db.items():
+            metrics.append(
+                f'db.{table}.{op};desc="{table} {op} x{count}";dur={seconds * 1000:.2f}'
+            )
+        if self.db_wait:
+            metrics.append(f"db-wait;dur={self.db_wait * 1000:.2f}")
+        if self.serialize:
+            metrics.append(f"serialize;dur={self.serialize * 1000:.2f}")
+        return ", ".join(metrics)
+
+    def debug_headers(self) -> list:
+        """Số truy vấn DB của request, tổng và theo bảng.thao tác"""
+        queries = ",".join(
+            f"{table}.{op}={count}" for (table, op), (count, _) in self.db.items()
+        )
+        return [
+            (b"x-db-query-count", str(self.db_calls).encode()),
+            (b"x-db-queries", queries.encode()),
+        ]
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar(
+    "request_timing", default=None
+)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    return _current.get()
+
+
+def record_db_call(table: str, op: str, seconds: float, wait: float = 0.0):
+    timing = _current.get()
+    if timing is None:  # Truy vấn ngoài request, vd. vòng kiểm tra DB nền
+        return
+    entry = timing.db.setdefault((table, op), [0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+    timing.db_wait += wait
+
+
+def record_serialize(seconds: float):
+    timing = _current.get()
+    if timing is not None:
+        timing.serialize += seconds
+
+
+def route_template(scope) -> str:
+    """Đường dẫn dạng template (vd. /orders/{order_id}) để gom nhóm theo route"""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    return "<unmatched>"
+
+
+class ServerTimingMiddleware:
+    """Đo thời gian mỗi request và từng truy vấn DB, trả về qua header
+    Server-Timing và ghi một dòng log JSON khi request kết thúc"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+        # Trả về số truy vấn DB của request qua header X-DB-Query-Count /
+        # X-DB-Queries. Đọc khi dựng middleware (sau load_dotenv), không lúc import
+        self.debug_headers = os.getenv("QUERY_DEBUG_HEADERS", "0") == "1"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total = time.perf_counter() - timing.start
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header(total).encode()))
+                if self.debug_headers:
+                    headers.extend(timing.debug_headers())
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.log(scope, status, timing)
+
+    def log(self, scope, status: int, timing: RequestTiming):
+        total_ms = (time.perf_counter() - timing.start) * 1000
+        if total_ms < LOG_MIN_MS or not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(
+            json.dumps(
+                {
+                    "service": self.service,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route_template(scope),
+                    "status": status,
+                    "duration_ms": round(total_ms, 2),
+                    "db_ms": round(timing.db_seconds * 1000, 2),
+                    "db_wait_ms": round(timing.db_wait * 1000, 2),
+                    "db_calls": timing.db_calls,
+                    "serialize_ms": round(timing.serialize * 1000, 2),
+                    "db": [
+                        {
+                            "table": table,
+                            "op": op,
+                            "calls": count,
+                            "ms": round(seconds * 1000, 2),
+                        }
+                        for (table, op), (count, seconds) in timing.db.items()
+                    ],
+                },
+                ensure_ascii=False,
+            )
+        )
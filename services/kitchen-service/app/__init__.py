@@ -1 +1,8 @@
 # Initialize kitchen service package
+import os
+import sys
+
+# Cho phép import gói dùng chung services/common khi chạy từ thư mục service
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
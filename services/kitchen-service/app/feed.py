@@ -0,0 +1,176 @@
+import asyncio
+import contextvars
+import os
+from typing import Dict, List, Optional, Set
+
+from common.responses import dumps
+
+# Trạng thái đơn hiển thị trên màn hình bếp
+ACTIVE_STATUSES = ["pending", "preparing"]
+# Các trường của món mà thay đổi cần gửi lại cả đơn (khác với đổi trạng thái món)
+ITEM_FIELDS = ("item_id", "quantity", "note")
+
+
+def format_event(event: str, data, event_id: Optional[int] = None) -> bytes:
+    """Một message Server-Sent Events, dữ liệu mã hoá JSON"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: ".encode() + dumps(data) + b"\n\n"
+
+
+class Subscriber:
+    def __init__(self, maxsize: int, snapshot: bytes):
+        # Message đầu tiên gửi cho màn hình, các sự kiện sau nó nằm trong queue
+        self.snapshot = snapshot
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize)
+
+
+class KitchenFeed:
+    """Luồng thay đổi dùng chung cho mọi màn hình bếp trong tiến trình.
+
+    Một vòng nền đọc các đơn đang chờ mỗi `interval` giây (2 truy vấn, không
+    phụ thuộc số màn hình), so với trạng thái trước đó và phát sự kiện tới
+    hàng đợi của từng màn hình. Thay đổi do chính kitchen-service ghi được phát
+    ngay qua `item_changed`. Vòng nền chỉ chạy khi có màn hình đang kết nối.
+    """
+
+    def __init__(self, db, interval: Optional[float] = None, queue_size: int = 100):
+        self.db = db
+        self.interval = interval or float(os.getenv("KITCHEN_FEED_INTERVAL", "2"))
+        self.queue_size = queue_size
+        self.orders: Dict[int, dict] = {}
+        self.subscribers: Set[Subscriber] = set()
+        self.sequence = 0
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def snapshot(self) -> List[dict]:
+        return sorted(self.orders.values(), key=lambda order: order["id"])
+
+    async def subscribe(self) -> Subscriber:
+        if self._task is None:
+            # Màn hình đầu tiên: nạp trạng thái mới nhất trước khi gửi snapshot
+            await self.refresh()
+        if self._task is None:
+            # Tạo vòng nền trong context rỗng để truy vấn của nó không bị tính
+            # vào request của màn hình đầu tiên (Server-Timing, X-DB-Query-Count)
+            self._task = contextvars.Context().run(asyncio.create_task, self._run())
+        # Tạo snapshot và đăng ký trong cùng một bước (không có await ở giữa):
+        # mọi thay đổi hoặc đã nằm trong snapshot, hoặc sẽ vào queue, không cả hai
+        snapshot = format_event("snapshot", self.snapshot(), self.sequence)
+        subscriber = Subscriber(self.queue_size, snapshot)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    async def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            await self.stop()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def publish(self, event: str, data):
+        self.sequence += 1
+        message = format_event(event, data, self.sequence)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Màn hình đọc không kịp: đóng kết nối, client tự kết nối lại
+                # và nhận snapshot mới
+                self.subscribers.discard(subscriber)
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
+
+    def item_changed(self, item: dict):
+        """Phát ngay thay đổi trạng thái món do kitchen-service vừa ghi"""
+        order = self.orders.get(item["order_id"])
+        if order is None or not self.subscribers:
+            return
+        for index, current in enumerate(order["items"]):
+            if current["id"] == item["id"]:
+                if current["status"] != item["status"]:
+                    order["items"][index] = item
+                    self.publish(
+                        "item_status_changed",
+                        {"order_id": item["order_id"], "item": item},
+                    )
+                return
+
+    def order_closed(self, order_id: int, status: str):
+        """Phát ngay việc đơn rời màn hình bếp do kitchen-service vừa ghi"""
+        if self.orders.pop(order_id, None) is not None and self.subscribers:
+            self.publish("order_removed", {"order_id": order_id, "status": status})
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Kitchen feed refresh failed: {str(e)}")
+
+    async def refresh(self):
+        async with self._lock:
+            response = await self.db.execute(
+                self.db.table("orders")
+                .select("*,order_items(*)")
+                .in_("status", ACTIVE_STATUSES)
+            )
+            latest = {}
+            for order in response.data:
+                order["items"] = sorted(
+                    order.pop("order_items"), key=lambda item: item["id"]
+                )
+                latest[order["id"]] = order
+
+            gone = [order_id for order_id in self.orders if order_id not in latest]
+            statuses = {}
+            if gone:
+                # Chỉ đọc trạng thái của các đơn vừa rời danh sách
+                closed = await self.db.execute(
+                    self.db.table("orders").select("id,status").in_("id", gone)
+                )
+                statuses = {row["id"]: row["status"] for row in closed.data}
+
+            previous, self.orders = self.orders, latest
+            self._diff(previous, latest, statuses)
+
+    def _diff(self, previous: Dict[int, dict], latest: Dict[int, dict], statuses):
+        for order_id in previous:
+            if order_id in latest:
+                continue
+            status = statuses.get(order_id)
+            if status == "cancelled":
+                self.publish("order_cancelled", {"order_id": order_id})
+            else:
+                self.publish("order_removed", {"order_id": order_id, "status": status})
+
+        for order_id, order in latest.items():
+            old = previous.get(order_id)
+            if old is None:
+                self.publish("order_created", order)
+                continue
+
+            old_items = {item["id"]: item for item in old["items"]}
+            new_items = {item["id"]: item for item in order["items"]}
+            items_changed = old_items.keys() != new_items.keys() or any(
+                old_items[item_id][field] != item[field]
+                for item_id, item in new_items.items()
+                for field in ITEM_FIELDS
+            )
+            if items_changed or old["status"] != order["status"]:
+                self.publish("order_updated", order)
+                continue
+            for item_id, item in new_items.items():
+                if old_items[item_id]["status"] != item["status"]:
+                    self.publish(
+                        "item_status_changed", {"order_id": order_id, "item": item}
+                    )
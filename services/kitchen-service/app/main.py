@@ -1,15 +1,21 @@
-import json
-import os
+import asyncio
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from supabase import Client, create_client
+
+from common.db import Database
+from common.health import HealthProbe
+from common.metrics import MetricsMiddleware, loop_monitor, metrics_response
+from common.responses import UnicodeJSONResponse
+from common.timing import ServerTimingMiddleware
+
+from .feed import KitchenFeed
 
 load_dotenv()
 
@@ -23,9 +29,10 @@ app = FastAPI(
 
 
 @app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
+async def custom_swagger_ui_html(request: Request):
     return get_swagger_ui_html(
-        openapi_url="/openapi.json",
+        # root_path khác rỗng khi service được mount trong monolith.py
+        openapi_url=request.scope.get("root_path", "") + "/openapi.json",
         title="Kitchen Service API Documentation",
         swagger_favicon_url="",
     )
@@ -40,25 +47,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Đo thời gian request và từng truy vấn DB (header Server-Timing + log JSON)
+app.add_middleware(ServerTimingMiddleware, service="kitchen-service")
 
-# Tùy chỉnh JSONResponse để xử lý Unicode
-class UnicodeJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+# Histogram độ trễ theo route/status và số request đang chạy cho /metrics
+app.add_middleware(MetricsMiddleware, service="kitchen-service")
 
 
 # Override default JSONResponse
 app.router.default_response_class = UnicodeJSONResponse
 
-supabase: Client = create_client(
-    supabase_url=os.getenv("SUPABASE_URL"), supabase_key=os.getenv("SUPABASE_KEY")
-)
+db = Database.from_env()
+app.on_event("startup")(db.connect)
+app.on_event("shutdown")(db.close)
+
+# Kiểm tra DB định kỳ ở nền cho /readyz và /health
+health = HealthProbe(db, "kitchen-service", tables=("order_items", "ingredients"))
+app.on_event("startup")(health.start)
+app.on_event("shutdown")(health.stop)
+
+# Đo độ trễ event loop cho /metrics
+app.on_event("startup")(loop_monitor.start)
+app.on_event("shutdown")(loop_monitor.stop)
+
+# Luồng thay đổi dùng chung cho mọi màn hình bếp đang mở /kitchen/stream
+feed = KitchenFeed(db)
+app.on_event("shutdown")(feed.stop)
+
+# Gửi comment giữ kết nối khi không có sự kiện (proxy hay đóng kết nối im lặng)
+STREAM_HEARTBEAT_SECONDS = 15
 
 
 class IngredientBase(BaseModel):
@@ -81,86 +98,139 @@ async def root():
     return {"message": "Kitchen Service is running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics dạng Prometheus (gộp mọi worker khi đặt PROMETHEUS_MULTIPROC_DIR)"""
+    return metrics_response()
+
+
+@app.get("/livez")
+async def liveness():
+    """Chỉ cho biết tiến trình còn phản hồi, không truy cập DB"""
+    return health.liveness()
+
+
+@app.get("/readyz")
+async def readiness():
+    """Kết quả kiểm tra DB gần nhất của vòng kiểm tra nền"""
+    return health.readiness()
+
+
 @app.get("/health")
 async def health_check():
-    try:
-        start_time = datetime.now()
-        # Kiểm tra các bảng cần thiết
-        supabase.table("order_items").select("count").limit(1).execute()
-        supabase.table("ingredients").select("count").limit(1).execute()
-        end_time = datetime.now()
-        response_time = (end_time - start_time).total_seconds() * 1000
-
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "response_time_ms": round(response_time, 2),
-            "timestamp": datetime.now().isoformat(),
-            "service": "kitchen-service",
-            "tables_checked": ["order_items", "ingredients"],
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "unhealthy",
-                "database": "disconnected",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "service": "kitchen-service",
-            },
-        )
+    return health.readiness()
 
 
 @app.get("/kitchen/pending-orders")
-async def get_pending_orders():
+async def get_pending_orders(
+    status: List[str] = Query(["pending"]), category_id: Optional[int] = None
+):
+    """Lấy các đơn hàng theo trạng thái kèm chi tiết món, số truy vấn không phụ thuộc số đơn"""
     try:
-        # Lấy các đơn hàng đang chờ xử lý
-        response = (
-            supabase.table("orders").select("*").eq("status", "pending").execute()
+        response = await db.execute(
+            db.table("orders").select("*").in_("status", status)
         )
         orders = response.data
+        if not orders:
+            return []
+
+        # Lấy chi tiết món ăn của tất cả đơn hàng trong một truy vấn
+        items_query = (
+            db.table("order_items")
+            .select("*")
+            .in_("order_id", [order["id"] for order in orders])
+        )
+        if category_id is not None:
+            # Mỗi khu bếp chỉ xem các món thuộc danh mục của mình
+            menu_items = await db.execute(
+                db.table("menu_items").select("id").eq("category_id", category_id)
+            )
+            items_query = items_query.in_(
+                "item_id", [item["id"] for item in menu_items.data]
+            )
+        items = await db.execute(items_query)
+
+        items_by_order = {}
+        for item in items.data:
+            items_by_order.setdefault(item["order_id"], []).append(item)
 
-        # Lấy chi tiết các món ăn cho mỗi đơn hàng
         for order in orders:
-            items = (
-                supabase.table("order_items")
-                .select("*")
-                .eq("order_id", order["id"])
-                .execute()
-            )
-            order["items"] = items.data
+            order["items"] = items_by_order.get(order["id"], [])
+
+        if category_id is not None:
+            orders = [order for order in orders if order["items"]]
 
         return orders
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/kitchen/stream")
+async def stream_kitchen_orders(request: Request):
+    """Server-Sent Events cho màn hình bếp: snapshot các đơn đang chờ rồi các
+    thay đổi, dùng chung một vòng đọc DB cho mọi màn hình"""
+    try:
+        subscriber = await feed.subscribe()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        try:
+            yield subscriber.snapshot
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscriber.queue.get(), STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": ping\n\n"
+                    continue
+                if message is None:  # Đọc không kịp, client kết nối lại
+                    break
+                yield message
+        finally:
+            await feed.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.put("/kitchen/order-items/{item_id}/status")
 async def update_order_item_status(item_id: int, status: str):
     try:
         # Cập nhật trạng thái món ăn
-        response = (
-            supabase.table("order_items")
+        response = await db.execute(
+            db.table("order_items")
             .update({"status": status, "updated_at": datetime.utcnow().isoformat()})
             .eq("id", item_id)
-            .execute()
         )
 
         if not response.data:
             raise HTTPException(status_code=404, detail="Order item not found")
+        feed.item_changed(response.data[0])
 
-        # Kiểm tra và cập nhật trạng thái đơn hàng nếu cần
+        # Kiểm tra và cập nhật trạng thái đơn hàng nếu cần, dựa trên bộ đếm
+        # items_total/items_completed mà trigger trên order_items giữ đồng bộ
         order_id = response.data[0]["order_id"]
-        items = (
-            supabase.table("order_items").select("*").eq("order_id", order_id).execute()
+        order = await db.execute(
+            db.table("orders")
+            .select("status,items_total,items_completed")
+            .eq("id", order_id)
+            .single()
         )
 
-        all_completed = all(item["status"] == "completed" for item in items.data)
-        if all_completed:
-            supabase.table("orders").update({"status": "completed"}).eq(
-                "id", order_id
-            ).execute()
+        counters = order.data
+        all_completed = counters["items_completed"] >= counters["items_total"]
+        if all_completed and counters["status"] != "completed":
+            await db.execute(
+                db.table("orders").update({"status": "completed"}).eq("id", order_id)
+            )
+            feed.order_closed(order_id, "completed")
 
         return {"message": f"Order item status updated to {status}"}
     except Exception as e:
@@ -170,7 +240,7 @@ async def update_order_item_status(item_id: int, status: str):
 @app.get("/kitchen/ingredients")
 async def get_ingredients():
     try:
-        response = supabase.table("ingredients").select("*").execute()
+        response = await db.execute(db.table("ingredients").select("*"))
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -180,11 +250,10 @@ async def get_ingredients():
 async def update_ingredient_quantity(ingredient_id: int, update: IngredientUpdate):
     try:
         # Update the ingredient quantity by ID
-        response = (
-            supabase.table("ingredients")  # Fixed table name
+        response = await db.execute(
+            db.table("ingredients")  # Fixed table name
             .update({"quantity": update.quantity})
             .eq("id", ingredient_id)
-            .execute()
         )
 
         if not response.data:
@@ -199,7 +268,7 @@ async def update_ingredient_quantity(ingredient_id: int, update: IngredientUpdat
 async def get_ingredients_report():
     try:
         # Get all ingredients
-        response = supabase.table("ingredients").select("*").execute()
+        response = await db.execute(db.table("ingredients").select("*"))
 
         if response.data is None:
             print("Debug: No data returned from ingredients table")
@@ -264,11 +333,10 @@ async def get_ingredients_report():
 async def check_ingredients_availability(request: IngredientCheckRequest):
     try:
         # Lấy thông tin về nguyên liệu cần thiết cho món ăn
-        ingredients_needed = (
-            supabase.table("item_ingredient")
+        ingredients_needed = await db.execute(
+            db.table("item_ingredient")
             .select("*,ingredient_id(*)")
             .eq("item_id", request.item_id)
-            .execute()
         )
 
         if not ingredients_needed.data:
@@ -309,9 +377,8 @@ async def check_ingredients_availability(request: IngredientCheckRequest):
 @app.post("/kitchen/ingredients")
 async def create_ingredient(ingredient: IngredientBase):
     try:
-        response = (
-            supabase.table("ingredients")
-            .insert(
+        response = await db.execute(
+            db.table("ingredients").insert(
                 {
                     "name": ingredient.name,
                     "quantity": ingredient.quantity,
@@ -319,7 +386,6 @@ async def create_ingredient(ingredient: IngredientBase):
                     "uom": ingredient.uom,  # Thêm trường uom
                 }
             )
-            .execute()
         )
 
         if not response.data:
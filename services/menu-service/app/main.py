@@ -1,15 +1,20 @@
-import json
+import hashlib
 import os
-from datetime import datetime
 from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from pydantic import BaseModel, validator
-from supabase import Client, create_client
+
+from common.cache import CacheInvalidationBus, TTLCache
+from common.db import Database
+from common.health import HealthProbe
+from common.metrics import MetricsMiddleware, loop_monitor, metrics_response
+from common.responses import UnicodeJSONResponse
+from common.timing import ServerTimingMiddleware
 
 load_dotenv()
 
@@ -23,9 +28,10 @@ app = FastAPI(
 
 
 @app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
+async def custom_swagger_ui_html(request: Request):
     return get_swagger_ui_html(
-        openapi_url="/openapi.json",
+        # root_path khác rỗng khi service được mount trong monolith.py
+        openapi_url=request.scope.get("root_path", "") + "/openapi.json",
         title="Menu Service API Documentation",
         swagger_favicon_url="",
     )
@@ -40,26 +46,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Đo thời gian request và từng truy vấn DB (header Server-Timing + log JSON)
+app.add_middleware(ServerTimingMiddleware, service="menu-service")
 
-# Tùy chỉnh JSONResponse để xử lý Unicode
-class UnicodeJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+# Histogram độ trễ theo route/status và số request đang chạy cho /metrics
+app.add_middleware(MetricsMiddleware, service="menu-service")
 
 
 # Override default JSONResponse
 app.router.default_response_class = UnicodeJSONResponse
 
-supabase: Client = create_client(
-    supabase_url=os.getenv("SUPABASE_URL"), supabase_key=os.getenv("SUPABASE_KEY")
+db = Database.from_env()
+app.on_event("startup")(db.connect)
+app.on_event("shutdown")(db.close)
+
+# Kiểm tra DB định kỳ ở nền cho /readyz và /health
+health = HealthProbe(db, "menu-service", tables=("menu_items",))
+app.on_event("startup")(health.start)
+app.on_event("shutdown")(health.stop)
+
+# Đo độ trễ event loop cho /metrics
+app.on_event("startup")(loop_monitor.start)
+app.on_event("shutdown")(loop_monitor.stop)
+
+# Cache đọc thực đơn, bị xoá chính xác khi có thao tác ghi món ăn
+menu_cache = TTLCache(
+    maxsize=int(os.getenv("MENU_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("MENU_CACHE_TTL", "300")),
+    name="menu",
 )
 
+
+def apply_menu_invalidation(change: dict):
+    """Xoá các khoá cache bị ảnh hưởng bởi thay đổi của một món ăn"""
+    menu_cache.invalidate(("menu_snapshot",))
+    if change.get("item_id") is not None:
+        menu_cache.invalidate(("menu_item", change["item_id"]))
+
+    # category_ids = None nghĩa là không biết danh mục cũ, xoá mọi danh sách
+    category_ids = change.get("category_ids")
+    if category_ids is None:
+        menu_cache.invalidate_where(lambda key: key[0] == "menu_items")
+    else:
+        menu_cache.invalidate_where(
+            lambda key: key[0] == "menu_items" and key[1] in (None, *category_ids)
+        )
+
+
+# Báo cho các worker khác xoá cache qua Supabase Realtime (CACHE_BROADCAST=1)
+menu_cache_bus = CacheInvalidationBus(db, "menu-cache", apply_menu_invalidation)
+if os.getenv("CACHE_BROADCAST") == "1":
+    app.on_event("startup")(menu_cache_bus.start)
+    app.on_event("shutdown")(menu_cache_bus.stop)
+
 # Constants
 VALID_ITEM_STATUSES = ["available", "unavailable", "out_of_stock"]
 
@@ -106,43 +145,35 @@ async def root():
     return {"message": "Menu Service is running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics dạng Prometheus (gộp mọi worker khi đặt PROMETHEUS_MULTIPROC_DIR)"""
+    return metrics_response()
+
+
+@app.get("/livez")
+async def liveness():
+    """Chỉ cho biết tiến trình còn phản hồi, không truy cập DB"""
+    return health.liveness()
+
+
+@app.get("/readyz")
+async def readiness():
+    """Kết quả kiểm tra DB gần nhất của vòng kiểm tra nền"""
+    return health.readiness()
+
+
 @app.get("/health")
 async def health_check():
-    try:
-        start_time = datetime.now()
-        response = supabase.table("menu_items").select("count").limit(1).execute()
-        end_time = datetime.now()
-        response_time = (end_time - start_time).total_seconds() * 1000
-
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "response_time_ms": round(response_time, 2),
-            "timestamp": datetime.now().isoformat(),
-            "service": "menu-service",
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "unhealthy",
-                "database": "disconnected",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "service": "menu-service",
-            },
-        )
+    return health.readiness()
 
 
 @app.post("/menu-items")
 async def create_menu_item(item: MenuItemCreate):
     try:
         # Check if category exists
-        category = (
-            supabase.table("menu_categories")
-            .select("id")
-            .eq("id", item.category_id)
-            .execute()
+        category = await db.execute(
+            db.table("menu_categories").select("id").eq("id", item.category_id)
         )
         if not category.data:
             raise HTTPException(
@@ -160,8 +191,8 @@ async def create_menu_item(item: MenuItemCreate):
                 )
 
         # Check for duplicate name
-        existing = (
-            supabase.table("menu_items").select("id").eq("name", item.name).execute()
+        existing = await db.execute(
+            db.table("menu_items").select("id").eq("name", item.name)
         )
         if existing.data:
             raise HTTPException(
@@ -169,7 +200,7 @@ async def create_menu_item(item: MenuItemCreate):
             )
 
         # Create the menu item
-        response = supabase.table("menu_items").insert(item.dict()).execute()
+        response = await db.execute(db.table("menu_items").insert(item.dict()))
 
         if not response.data:
             raise HTTPException(
@@ -177,6 +208,7 @@ async def create_menu_item(item: MenuItemCreate):
                 detail="Không thể tạo món ăn. Vui lòng kiểm tra dữ liệu đầu vào",
             )
 
+        await menu_cache_bus.publish({"category_ids": [item.category_id]})
         return response.data[0]
 
     except HTTPException:
@@ -188,9 +220,18 @@ async def create_menu_item(item: MenuItemCreate):
 @app.get("/menu-items/{item_id}")
 async def get_menu_item(item_id: int):
     try:
-        response = supabase.table("menu_items").select("*").eq("id", item_id).execute()
+        cache_key = ("menu_item", item_id)
+        cached = menu_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        generation = menu_cache.generation
+        response = await db.execute(
+            db.table("menu_items").select("*").eq("id", item_id)
+        )
 
         if len(response.data) > 0:
+            menu_cache.set(cache_key, response.data[0], generation)
             return response.data[0]
         raise HTTPException(status_code=404, detail="Không tìm thấy món ăn")
     except Exception as e:
@@ -215,11 +256,10 @@ async def update_menu_item(item_id: int, item: MenuItemUpdate):
 
         # Validate category_id if it's being updated
         if "category_id" in update_data:
-            category = (
-                supabase.table("menu_categories")
+            category = await db.execute(
+                db.table("menu_categories")
                 .select("id")
                 .eq("id", update_data["category_id"])
-                .execute()
             )
             if not category.data:
                 raise HTTPException(status_code=404, detail="Danh mục không tồn tại")
@@ -228,11 +268,21 @@ async def update_menu_item(item_id: int, item: MenuItemUpdate):
         if "price" in update_data and update_data["price"] <= 0:
             raise HTTPException(status_code=400, detail="Giá phải lớn hơn 0")
 
-        response = (
-            supabase.table("menu_items").update(update_data).eq("id", item_id).execute()
+        response = await db.execute(
+            db.table("menu_items").update(update_data).eq("id", item_id)
         )
 
         if len(response.data) > 0:
+            await menu_cache_bus.publish(
+                {
+                    "item_id": item_id,
+                    "category_ids": (
+                        None
+                        if "category_id" in update_data
+                        else [response.data[0]["category_id"]]
+                    ),
+                }
+            )
             return response.data[0]
         raise HTTPException(status_code=404, detail="Không tìm thấy món ăn")
     except HTTPException:
@@ -245,14 +295,17 @@ async def update_menu_item(item_id: int, item: MenuItemUpdate):
 async def delete_menu_item(item_id: int):
     try:
         # Soft delete by updating status to 'unavailable'
-        response = (
-            supabase.table("menu_items")
-            .update({"status": "unavailable"})
-            .eq("id", item_id)
-            .execute()
+        response = await db.execute(
+            db.table("menu_items").update({"status": "unavailable"}).eq("id", item_id)
         )
 
         if len(response.data) > 0:
+            await menu_cache_bus.publish(
+                {
+                    "item_id": item_id,
+                    "category_ids": [response.data[0]["category_id"]],
+                }
+            )
             return {"message": "Đã vô hiệu hóa món ăn thành công"}
         raise HTTPException(status_code=404, detail="Không tìm thấy món ăn")
     except Exception as e:
@@ -262,7 +315,12 @@ async def delete_menu_item(item_id: int):
 @app.get("/menu-categories")
 async def get_categories():
     try:
-        response = supabase.table("menu_categories").select("*").execute()
+        cached = menu_cache.get(("menu_categories",))
+        if cached is not None:
+            return cached
+
+        response = await db.execute(db.table("menu_categories").select("*"))
+        menu_cache.set(("menu_categories",), response.data)
         return response.data
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -273,19 +331,73 @@ async def get_menu_items(
     category_id: Optional[int] = None, status: Optional[str] = None
 ):
     try:
-        query = supabase.table("menu_items").select("*")
+        cache_key = ("menu_items", category_id, status)
+        cached = menu_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        generation = menu_cache.generation
+        query = db.table("menu_items").select("*")
 
         if category_id:
             query = query.eq("category_id", category_id)
         if status:
             query = query.eq("status", status)
 
-        response = query.execute()
+        response = await db.execute(query)
+        menu_cache.set(cache_key, response.data, generation)
         return response.data
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+async def build_menu_snapshot() -> tuple:
+    """Dựng cây danh mục -> món ăn, mã hoá sẵn thành bytes kèm ETag"""
+    generation = menu_cache.generation
+    categories = await get_categories()
+    items = await get_menu_items()
+
+    items_by_category = {}
+    for item in items:
+        items_by_category.setdefault(item["category_id"], []).append(item)
+    menu = [
+        {**category, "items": items_by_category.get(category["id"], [])}
+        for category in categories
+    ]
+
+    body = UnicodeJSONResponse(menu).body
+    snapshot = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+    menu_cache.set(("menu_snapshot",), snapshot, generation)
+    return snapshot
+
+
+@app.get("/menu")
+async def get_menu(if_none_match: Optional[str] = Header(None)):
+    """Toàn bộ thực đơn theo danh mục, hỗ trợ If-None-Match để trả về 304"""
+    try:
+        snapshot = menu_cache.get(("menu_snapshot",))
+        if snapshot is None:
+            snapshot = await build_menu_snapshot()
+        body, etag = snapshot
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if "*" in tags or etag in tags:
+                return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type="application/json", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/menu-cache/stats")
+async def get_menu_cache_stats():
+    return menu_cache.stats()
+
+
 if __name__ == "__main__":
     import uvicorn
 
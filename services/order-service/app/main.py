@@ -1,15 +1,21 @@
-import json
-import os
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import JSONResponse
+from postgrest.exceptions import APIError
 from pydantic import BaseModel
-from supabase import Client, create_client
+
+from common.db import Database, is_missing_function
+from common.export import stream_export
+from common.health import HealthProbe
+from common.metrics import MetricsMiddleware, loop_monitor, metrics_response
+from common.pagination import DEFAULT_PAGE_SIZE, page_result, paginate
+from common.responses import UnicodeJSONResponse
+from common.security import TokenUser, check_settings, get_current_user, require_roles
+from common.timing import ServerTimingMiddleware
 
 load_dotenv()
 
@@ -30,6 +36,8 @@ class OrderCreate(BaseModel):
 
 class OrderStatusUpdate(BaseModel):
     status: str
+    # Trạng thái client đang thấy; nếu đơn đã đổi sang trạng thái khác thì trả 409
+    expected_status: Optional[str] = None
 
 
 class OrderItemAdjust(BaseModel):
@@ -39,6 +47,9 @@ class OrderItemAdjust(BaseModel):
     note: Optional[str] = None
 
 
+ADJUST_ACTIONS = ["add", "modify", "remove"]
+
+
 app = FastAPI(
     title="Order Service API",
     description="APIs for managing restaurant orders including order creation, status updates, and order details",
@@ -49,9 +60,10 @@ app = FastAPI(
 
 
 @app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
+async def custom_swagger_ui_html(request: Request):
     return get_swagger_ui_html(
-        openapi_url="/openapi.json",
+        # root_path khác rỗng khi service được mount trong monolith.py
+        openapi_url=request.scope.get("root_path", "") + "/openapi.json",
         title="Order Service API Documentation",
         swagger_favicon_url="",
     )
@@ -66,25 +78,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Đo thời gian request và từng truy vấn DB (header Server-Timing + log JSON)
+app.add_middleware(ServerTimingMiddleware, service="order-service")
 
-# Tùy chỉnh JSONResponse để xử lý Unicode
-class UnicodeJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+# Histogram độ trễ theo route/status và số request đang chạy cho /metrics
+app.add_middleware(MetricsMiddleware, service="order-service")
 
 
 # Override default JSONResponse
 app.router.default_response_class = UnicodeJSONResponse
 
-supabase: Client = create_client(
-    supabase_url=os.getenv("SUPABASE_URL"), supabase_key=os.getenv("SUPABASE_KEY")
-)
+db = Database.from_env()
+app.on_event("startup")(db.connect)
+app.on_event("shutdown")(db.close)
+
+# Kiểm tra DB định kỳ ở nền cho /readyz và /health
+health = HealthProbe(db, "order-service", tables=("orders", "order_items"))
+app.on_event("startup")(health.start)
+app.on_event("shutdown")(health.stop)
+
+# Đo độ trễ event loop cho /metrics
+app.on_event("startup")(loop_monitor.start)
+app.on_event("shutdown")(loop_monitor.stop)
+
+# Không khởi động khi thiếu SECRET_KEY, tránh ký/kiểm tra token bằng khoá rỗng
+app.on_event("startup")(check_settings)
+
+# Xác thực JWT cục bộ, không cần gọi user-service
+require_user = Depends(get_current_user)
+require_admin = Depends(require_roles("admin"))
 
 
 @app.get("/")
@@ -92,69 +114,78 @@ async def root():
     return {"message": "Order Service is running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics dạng Prometheus (gộp mọi worker khi đặt PROMETHEUS_MULTIPROC_DIR)"""
+    return metrics_response()
+
+
+@app.get("/livez")
+async def liveness():
+    """Chỉ cho biết tiến trình còn phản hồi, không truy cập DB"""
+    return health.liveness()
+
+
+@app.get("/readyz")
+async def readiness():
+    """Kết quả kiểm tra DB gần nhất của vòng kiểm tra nền"""
+    return health.readiness()
+
+
 @app.get("/health")
 async def health_check():
-    try:
-        start_time = datetime.now()
-        response = supabase.table("orders").select("count").limit(1).execute()
-        end_time = datetime.now()
-        response_time = (end_time - start_time).total_seconds() * 1000
+    return health.readiness()
 
-        # Kiểm tra thêm bảng order_items
-        supabase.table("order_items").select("count").limit(1).execute()
 
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "response_time_ms": round(response_time, 2),
-            "timestamp": datetime.now().isoformat(),
-            "service": "order-service",
-            "tables_checked": ["orders", "order_items"],
-        }
-    except Exception as e:
+async def get_menu_prices(item_ids: List[int]) -> dict:
+    """Lấy giá của nhiều món trong một truy vấn, báo lỗi gộp cho các món không hợp lệ"""
+    unique_ids = list(dict.fromkeys(item_ids))
+    response = await db.execute(
+        db.table("menu_items").select("id,price,status").in_("id", unique_ids)
+    )
+    rows = {row["id"]: row for row in response.data}
+
+    missing = [item_id for item_id in unique_ids if item_id not in rows]
+    if missing:
         raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "unhealthy",
-                "database": "disconnected",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "service": "order-service",
-            },
+            status_code=404,
+            detail=f"Menu items not found: {', '.join(map(str, missing))}",
         )
 
+    unavailable = [
+        item_id for item_id in unique_ids if rows[item_id]["status"] != "available"
+    ]
+    if unavailable:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Menu items not available: {', '.join(map(str, unavailable))}",
+        )
+
+    return {item_id: rows[item_id]["price"] for item_id in unique_ids}
+
 
 @app.post("/orders")
-async def create_order(order: OrderCreate):
+async def create_order(order: OrderCreate, user: TokenUser = require_user):
     try:
-        # Fetch menu items to get prices
-        menu_items = {}
-        for item in order.items:
-            response = (
-                supabase.table("menu_items")
-                .select("price")
-                .eq("id", item.item_id)
-                .single()
-                .execute()
+        if not order.items:
+            raise HTTPException(
+                status_code=400, detail="Order must contain at least one item"
             )
-            if not response.data:
-                raise HTTPException(
-                    status_code=404, detail=f"Menu item {item.item_id} not found"
-                )
-            menu_items[item.item_id] = response.data["price"]
+
+        # Fetch prices of all menu items in one query
+        menu_items = await get_menu_prices([item.item_id for item in order.items])
 
         # Tạo đơn hàng mới
         order_data = {
             "table_id": order.table_id,
-            "user_id": order.user_id,
+            "user_id": order.user_id or user.id,
             "status": "pending",
             "created_at": datetime.utcnow().isoformat(),
-            "total_amount": sum(
-                menu_items[item.item_id] * item.quantity for item in order.items
-            ),
+            # total_amount và số món được trigger cộng dồn khi thêm order_items
+            "total_amount": 0,
         }
 
-        order_response = supabase.table("orders").insert(order_data).execute()
+        order_response = await db.execute(db.table("orders").insert(order_data))
 
         if not order_response.data:
             raise HTTPException(status_code=500, detail="Failed to create order")
@@ -175,26 +206,31 @@ async def create_order(order: OrderCreate):
             for item in order.items
         ]
 
-        items_response = supabase.table("order_items").insert(order_items).execute()
+        items_response = await db.execute(db.table("order_items").insert(order_items))
 
         return {
             "order_id": order_id,
             "message": "Order created successfully",
             "items": items_response.data,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/orders")
+@app.get("/orders", dependencies=[require_user])
 async def get_orders(
     table_id: Optional[int] = None,
     status: Optional[str] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
 ):
+    """Danh sách đơn hàng mới nhất trước, phân trang theo (created_at, id)"""
     try:
-        query = supabase.table("orders").select("*")
+        query = db.table("orders").select("*")
 
         if table_id:
             query = query.eq("table_id", table_id)
@@ -205,24 +241,60 @@ async def get_orders(
         if to_date:
             query = query.lte("created_at", to_date)
 
-        response = query.execute()
-        return response.data
+        response = await db.execute(paginate(query, cursor, limit))
+        orders, next_cursor = page_result(response.data, limit)
+        return {"orders": orders, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/orders/{order_id}")
+ORDER_EXPORT_COLUMNS = [
+    "id",
+    "table_id",
+    "user_id",
+    "status",
+    "total_amount",
+    "created_at",
+    "updated_at",
+]
+
+
+@app.get("/orders/export", dependencies=[require_admin])
+async def export_orders(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    status: Optional[str] = None,
+    fmt: str = Query("csv", alias="format"),
+):
+    """Xuất đơn hàng dạng CSV hoặc NDJSON, đọc và gửi từng trang"""
+
+    def build_query():
+        query = db.table("orders").select(",".join(ORDER_EXPORT_COLUMNS))
+        if status:
+            query = query.eq("status", status)
+        if from_date:
+            query = query.gte("created_at", from_date)
+        if to_date:
+            query = query.lte("created_at", to_date)
+        return query
+
+    return stream_export(db, build_query, ORDER_EXPORT_COLUMNS, fmt, "orders")
+
+
+@app.get("/orders/{order_id}", dependencies=[require_user])
 async def get_order(order_id: int):
     try:
-        response = (
-            supabase.table("orders").select("*").eq("id", order_id).single().execute()
+        response = await db.execute(
+            db.table("orders").select("*").eq("id", order_id).single()
         )
         if not response.data:
             raise HTTPException(status_code=404, detail="Order not found")
 
         # Lấy thêm chi tiết đơn hàng
-        items = (
-            supabase.table("order_items").select("*").eq("order_id", order_id).execute()
+        items = await db.execute(
+            db.table("order_items").select("*").eq("order_id", order_id)
         )
         response.data["items"] = items.data
         return response.data
@@ -239,122 +311,279 @@ VALID_STATUS_TRANSITIONS = {
 }
 
 
-@app.put("/orders/{order_id}/status")
+def allowed_previous_statuses(new_status: str) -> List[str]:
+    """Các trạng thái được phép chuyển sang `new_status`"""
+    return [
+        status
+        for status, transitions in VALID_STATUS_TRANSITIONS.items()
+        if new_status in transitions
+    ]
+
+
+async def read_order_status(order_id: int) -> Optional[str]:
+    response = await db.execute(
+        db.table("orders").select("status").eq("id", order_id).maybe_single()
+    )
+    return response.data["status"] if response and response.data else None
+
+
+async def transition_order_status(
+    order_id: int, new_status: str, expected_status: Optional[str] = None
+) -> Tuple[str, Optional[str]]:
+    """Kiểm tra và chuyển trạng thái đơn cùng các món trong một thao tác.
+
+    Trả về (kết quả, trạng thái trước đó) với kết quả là `updated`, `invalid`,
+    `conflict` (trạng thái đã bị đổi bởi request khác) hoặc `not_found`.
+    """
+    allowed = allowed_previous_statuses(new_status)
+    if db.supports_rpc:
+        try:
+            # Khoá dòng đơn hàng, kiểm tra và cập nhật cả hai bảng trong database
+            response = await db.execute(
+                db.rpc(
+                    "transition_order_status",
+                    {
+                        "p_order_id": order_id,
+                        "p_status": new_status,
+                        "p_allowed_from": allowed,
+                        "p_expected_status": expected_status,
+                    },
+                )
+            )
+            row = response.data[0]
+            return row["outcome"], row["current_status"]
+        except APIError as e:
+            # Chỉ dùng compare-and-set khi chưa tạo function; lỗi khác (vd. hết
+            # thời gian chờ khoá dòng) trả về cho client
+            if not is_missing_function(e):
+                raise
+
+    # Compare-and-set: chỉ cập nhật nếu trạng thái vẫn là trạng thái đã kiểm tra
+    current_status = expected_status or await read_order_status(order_id)
+    if current_status is None:
+        return "not_found", None
+    if current_status not in allowed:
+        if expected_status is not None:
+            actual_status = await read_order_status(order_id)
+            if actual_status is None:
+                return "not_found", None
+            if actual_status != expected_status:
+                return "conflict", actual_status
+        return "invalid", current_status
+
+    response = await db.execute(
+        db.table("orders")
+        .update({"status": new_status})
+        .eq("id", order_id)
+        .eq("status", current_status)
+    )
+    if not response.data:
+        actual_status = await read_order_status(order_id)
+        if actual_status is None:
+            return "not_found", None
+        return "conflict", actual_status
+
+    await db.execute(
+        db.table("order_items").update({"status": new_status}).eq("order_id", order_id)
+    )
+    return "updated", current_status
+
+
+@app.put("/orders/{order_id}/status", dependencies=[require_user])
 async def update_order_status(order_id: int, status_update: OrderStatusUpdate):
+    new_status = status_update.status
     try:
-        # Get current order status
-        order_response = (
-            supabase.table("orders")
-            .select("status")
-            .eq("id", order_id)
-            .single()
-            .execute()
+        outcome, current_status = await transition_order_status(
+            order_id, new_status, status_update.expected_status
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Lỗi cập nhật trạng thái đơn hàng: {str(e)}"
         )
-        if not order_response.data:
-            raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
 
-        current_status = order_response.data["status"]
-        new_status = status_update.status
+    if outcome == "not_found":
+        raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
+    if outcome == "conflict":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Trạng thái đơn hàng vừa được đổi thành '{current_status}', vui lòng tải lại đơn hàng",
+        )
+    if outcome == "invalid":
+        valid_transitions = ", ".join(VALID_STATUS_TRANSITIONS.get(current_status, []))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Không thể chuyển trạng thái từ '{current_status}' sang '{new_status}'. Chỉ cho phép chuyển sang: {valid_transitions}",
+        )
 
-        # Validate status transition
-        if new_status not in VALID_STATUS_TRANSITIONS[current_status]:
-            valid_transitions = ", ".join(VALID_STATUS_TRANSITIONS[current_status])
-            raise HTTPException(
-                status_code=400,
-                detail=f"Không thể chuyển trạng thái từ '{current_status}' sang '{new_status}'. Chỉ cho phép chuyển sang: {valid_transitions}",
+    return {
+        "message": f"Cập nhật trạng thái đơn hàng thành '{new_status}'",
+        "order_id": order_id,
+        "status": new_status,
+    }
+
+
+ADJUSTABLE_STATUSES = ["pending", "preparing"]
+
+
+class OrderAdjustment:
+    """Áp dụng các thao tác add/modify/remove lên bản sao các món của đơn trong
+    bộ nhớ, rồi gom thành tối đa một lệnh insert, một upsert và một delete"""
+
+    def __init__(self, order_id: int, items: List[dict]):
+        self.order_id = order_id
+        self.originals: Dict[int, dict] = {item["id"]: item for item in items}
+        self.current: Dict[int, dict] = {item["id"]: dict(item) for item in items}
+        self.inserts: List[dict] = []
+
+    def apply(self, item: OrderItemAdjust, prices: dict):
+        if item.action == "add":
+            self.inserts.append(
+                {
+                    "order_id": self.order_id,
+                    "item_id": item.item_id,
+                    "quantity": item.quantity,
+                    "price": prices[item.item_id],
+                    "status": "pending",
+                    "note": item.note,
+                    "created_at": datetime.utcnow().isoformat(),
+                }
             )
+            return
 
-        # Update order status
-        response = (
-            supabase.table("orders")
-            .update({"status": new_status})
-            .eq("id", order_id)
-            .execute()
-        )
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
+        existing = [
+            row for row in self.current.values() if row["item_id"] == item.item_id
+        ]
+        added = [row for row in self.inserts if row["item_id"] == item.item_id]
+        if not existing and not added:
+            raise HTTPException(
+                status_code=404, detail=f"Order item not found: {item.item_id}"
+            )
+        if item.action == "modify":
+            for row in existing + added:
+                row.update({"quantity": item.quantity, "note": item.note})
+        else:
+            for row in existing:
+                del self.current[row["id"]]
+            self.inserts = [row for row in self.inserts if row not in added]
+
+    @property
+    def updates(self) -> List[dict]:
+        return [
+            row for row_id, row in self.current.items() if row != self.originals[row_id]
+        ]
 
-        # Update all order items status
-        supabase.table("order_items").update({"status": new_status}).eq(
-            "order_id", order_id
-        ).execute()
+    @property
+    def deleted(self) -> List[dict]:
+        return [
+            row for row_id, row in self.originals.items() if row_id not in self.current
+        ]
 
-        return {
-            "message": f"Cập nhật trạng thái đơn hàng thành '{new_status}'",
-            "order_id": order_id,
-            "status": new_status,
-        }
-    except HTTPException:
+    @property
+    def total_amount(self) -> float:
+        rows = list(self.current.values()) + self.inserts
+        return sum(row["price"] * row["quantity"] for row in rows)
+
+
+async def apply_adjustment(adjustment: OrderAdjustment):
+    """Ghi các thay đổi của một lần điều chỉnh đơn theo kiểu tất cả hoặc không"""
+    if db.supports_rpc:
+        try:
+            # Một transaction trong database, total_amount được tính lại tại chỗ
+            await db.execute(
+                db.rpc(
+                    "apply_order_adjustment",
+                    {
+                        "p_order_id": adjustment.order_id,
+                        "p_inserts": adjustment.inserts,
+                        "p_updates": adjustment.updates,
+                        "p_delete_ids": [row["id"] for row in adjustment.deleted],
+                    },
+                )
+            )
+            return
+        except APIError as e:
+            # Function đã rollback toàn bộ; chỉ ghi lại bằng cách dự phòng khi
+            # function chưa được tạo, không lặp lại các ghi vừa thất bại
+            if e.code == "P0001":
+                raise HTTPException(status_code=409, detail=e.message)
+            if e.code and e.code.startswith("23"):
+                # Vi phạm ràng buộc (khoá ngoại, check...): dữ liệu điều chỉnh sai
+                raise HTTPException(status_code=400, detail=e.message)
+            if not is_missing_function(e):
+                raise
+
+    # Không có transaction: nếu một bước lỗi thì hoàn tác các bước đã ghi.
+    # total_amount của đơn được trigger trên order_items cập nhật theo từng thay đổi
+    undo = []
+    try:
+        if adjustment.inserts:
+            response = await db.execute(
+                db.table("order_items").insert(adjustment.inserts)
+            )
+            inserted_ids = [row["id"] for row in response.data]
+            undo.append(db.table("order_items").delete().in_("id", inserted_ids))
+        if adjustment.updates:
+            originals = [adjustment.originals[row["id"]] for row in adjustment.updates]
+            await db.execute(db.table("order_items").upsert(adjustment.updates))
+            undo.append(db.table("order_items").upsert(originals))
+        if adjustment.deleted:
+            deleted_ids = [row["id"] for row in adjustment.deleted]
+            await db.execute(db.table("order_items").delete().in_("id", deleted_ids))
+    except Exception:
+        for query in reversed(undo):
+            await db.execute(query)
         raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Lỗi cập nhật trạng thái đơn hàng: {str(e)}"
-        )
 
 
-@app.put("/orders/{order_id}/adjust")
+@app.put("/orders/{order_id}/adjust", dependencies=[require_user])
 async def adjust_order(order_id: int, items: List[OrderItemAdjust]):
     try:
-        # Verify order exists and is in adjustable state
-        order = (
-            supabase.table("orders").select("*").eq("id", order_id).single().execute()
+        # Đơn hàng và các món hiện có trong một truy vấn
+        order = await db.execute(
+            db.table("orders")
+            .select("status,order_items(*)")
+            .eq("id", order_id)
+            .maybe_single()
         )
-        if not order.data:
+        if not order or not order.data:
             raise HTTPException(status_code=404, detail="Order not found")
-        if order.data["status"] not in ["pending", "preparing"]:
+        if order.data["status"] not in ADJUSTABLE_STATUSES:
             raise HTTPException(
                 status_code=400, detail="Order cannot be adjusted in current state"
             )
 
-        for item in items:
-            if item.action == "add":
-                # Add new item to order
-                new_item = {
-                    "order_id": order_id,
-                    "item_id": item.item_id,
-                    "quantity": item.quantity,
-                    "status": "pending",
-                    "note": item.note,
-                    "created_at": datetime.utcnow().isoformat(),
-                }
-                supabase.table("order_items").insert(new_item).execute()
-
-            elif item.action == "modify":
-                # Modify existing item quantity
-                supabase.table("order_items").update(
-                    {"quantity": item.quantity, "note": item.note}
-                ).eq("order_id", order_id).eq("item_id", item.item_id).execute()
-
-            elif item.action == "remove":
-                # Remove item from order
-                supabase.table("order_items").delete().eq("order_id", order_id).eq(
-                    "item_id", item.item_id
-                ).execute()
-
-        # Recalculate total amount
-        items_response = (
-            supabase.table("order_items").select("*").eq("order_id", order_id).execute()
-        )
-        total_amount = sum(
-            item["price"] * item["quantity"] for item in items_response.data
-        )
+        invalid = [item.action for item in items if item.action not in ADJUST_ACTIONS]
+        if invalid:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid actions: {', '.join(invalid)}"
+            )
 
-        # Update order total
-        supabase.table("orders").update({"total_amount": total_amount}).eq(
-            "id", order_id
-        ).execute()
+        # Giá của các món thêm mới, lấy trong một truy vấn
+        added = [item.item_id for item in items if item.action == "add"]
+        prices = await get_menu_prices(added) if added else {}
 
-        return {"message": "Order adjusted successfully", "order_id": order_id}
+        adjustment = OrderAdjustment(order_id, order.data["order_items"])
+        for item in items:
+            adjustment.apply(item, prices)
+        await apply_adjustment(adjustment)
+
+        return {
+            "message": "Order adjusted successfully",
+            "order_id": order_id,
+            "total_amount": adjustment.total_amount,
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.delete("/orders/{order_id}/items/{item_id}")
+@app.delete("/orders/{order_id}/items/{item_id}", dependencies=[require_user])
 async def delete_order_item(order_id: int, item_id: int):
     try:
         # Verify order exists and is in cancellable state
-        order = (
-            supabase.table("orders").select("*").eq("id", order_id).single().execute()
+        order = await db.execute(
+            db.table("orders").select("*").eq("id", order_id).single()
         )
         if not order.data:
             raise HTTPException(status_code=404, detail="Order not found")
@@ -365,29 +594,16 @@ async def delete_order_item(order_id: int, item_id: int):
             )
 
         # Delete the order item
-        response = (
-            supabase.table("order_items")
+        response = await db.execute(
+            db.table("order_items")
             .delete()
             .eq("order_id", order_id)
             .eq("item_id", item_id)
-            .execute()
         )
         if not response.data:
             raise HTTPException(status_code=404, detail="Order item not found")
 
-        # Recalculate total amount
-        items_response = (
-            supabase.table("order_items").select("*").eq("order_id", order_id).execute()
-        )
-        total_amount = sum(
-            item["price"] * item["quantity"] for item in items_response.data
-        )
-
-        # Update order total
-        supabase.table("orders").update({"total_amount": total_amount}).eq(
-            "id", order_id
-        ).execute()
-
+        # total_amount của đơn đã được trigger trừ đi theo các món vừa xoá
         return {"message": "Order item cancelled successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,15 +1,21 @@
-import json
-import os
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Iterable, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import JSONResponse
+from postgrest.exceptions import APIError
 from pydantic import BaseModel
-from supabase import Client, create_client
+
+from common.db import Database, is_missing_function, is_missing_relation
+from common.export import stream_export
+from common.health import HealthProbe
+from common.metrics import MetricsMiddleware, loop_monitor, metrics_response
+from common.pagination import DEFAULT_PAGE_SIZE, page_result, paginate
+from common.responses import UnicodeJSONResponse
+from common.security import check_settings, get_current_user, require_roles
+from common.timing import ServerTimingMiddleware
 
 load_dotenv()
 
@@ -30,25 +36,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Đo thời gian request và từng truy vấn DB (header Server-Timing + log JSON)
+app.add_middleware(ServerTimingMiddleware, service="payment-service")
 
-# Tùy chỉnh JSONResponse để xử lý Unicode
-class UnicodeJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+# Histogram độ trễ theo route/status và số request đang chạy cho /metrics
+app.add_middleware(MetricsMiddleware, service="payment-service")
 
 
 # Override default JSONResponse
 app.router.default_response_class = UnicodeJSONResponse
 
-supabase: Client = create_client(
-    supabase_url=os.getenv("SUPABASE_URL"), supabase_key=os.getenv("SUPABASE_KEY")
-)
+db = Database.from_env()
+app.on_event("startup")(db.connect)
+app.on_event("shutdown")(db.close)
+
+# Kiểm tra DB định kỳ ở nền cho /readyz và /health
+health = HealthProbe(db, "payment-service", tables=("bills",))
+app.on_event("startup")(health.start)
+app.on_event("shutdown")(health.stop)
+
+# Đo độ trễ event loop cho /metrics
+app.on_event("startup")(loop_monitor.start)
+app.on_event("shutdown")(loop_monitor.stop)
+
+# Không khởi động khi thiếu SECRET_KEY, tránh ký/kiểm tra token bằng khoá rỗng
+app.on_event("startup")(check_settings)
+
+# Xác thực JWT cục bộ, không cần gọi user-service
+require_user = Depends(get_current_user)
+require_admin = Depends(require_roles("admin"))
 
 
 class BillCreate(BaseModel):
@@ -62,44 +78,35 @@ async def root():
     return {"message": "Payment Service is running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics dạng Prometheus (gộp mọi worker khi đặt PROMETHEUS_MULTIPROC_DIR)"""
+    return metrics_response()
+
+
+@app.get("/livez")
+async def liveness():
+    """Chỉ cho biết tiến trình còn phản hồi, không truy cập DB"""
+    return health.liveness()
+
+
+@app.get("/readyz")
+async def readiness():
+    """Kết quả kiểm tra DB gần nhất của vòng kiểm tra nền"""
+    return health.readiness()
+
+
 @app.get("/health")
 async def health_check():
-    try:
-        start_time = datetime.now()
-        response = supabase.table("bills").select("count").limit(1).execute()
-        end_time = datetime.now()
-        response_time = (end_time - start_time).total_seconds() * 1000
-
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "response_time_ms": round(response_time, 2),
-            "timestamp": datetime.now().isoformat(),
-            "service": "payment-service",
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "unhealthy",
-                "database": "disconnected",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "service": "payment-service",
-            },
-        )
+    return health.readiness()
 
 
-@app.post("/payments/bills")
+@app.post("/payments/bills", dependencies=[require_user])
 async def create_bill(bill: BillCreate):
     try:
         # Get order details first to calculate total amount
-        order = (
-            supabase.table("orders")
-            .select("*")
-            .eq("id", bill.order_id)
-            .single()
-            .execute()
+        order = await db.execute(
+            db.table("orders").select("*").eq("id", bill.order_id).single()
         )
         if not order.data:
             raise HTTPException(status_code=404, detail="Order not found")
@@ -110,26 +117,27 @@ async def create_bill(bill: BillCreate):
             "total_amount": order.data["total_amount"],
             "payment_method": bill.payment_method,
             "user_id": bill.created_by,  # Use user_id instead of created_by
-            "created_at": datetime.now().isoformat(),
+            # Giờ UTC có múi giờ, khớp với ngày UTC của daily_revenue và báo cáo
+            "created_at": datetime.now(timezone.utc).isoformat(),
         }
 
-        response = supabase.table("bills").insert(bill_data).execute()
+        response = await db.execute(db.table("bills").insert(bill_data))
 
         # Update order status to "completed"
-        supabase.table("orders").update({"status": "completed"}).eq(
-            "id", bill.order_id
-        ).execute()
+        await db.execute(
+            db.table("orders").update({"status": "completed"}).eq("id", bill.order_id)
+        )
 
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/payments/bills/{bill_id}")
+@app.get("/payments/bills/{bill_id}", dependencies=[require_user])
 async def get_bill(bill_id: int):
     try:
-        response = (
-            supabase.table("bills").select("*").eq("id", bill_id).single().execute()
+        response = await db.execute(
+            db.table("bills").select("*").eq("id", bill_id).single()
         )
         if not response.data:
             raise HTTPException(status_code=404, detail="Bill not found")
@@ -138,88 +146,174 @@ async def get_bill(bill_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/payments/history")
+@app.get("/payments/history", dependencies=[require_user])
 async def get_payment_history(
-    start_date: Optional[str] = None, end_date: Optional[str] = None
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
 ):
+    """Lịch sử hóa đơn mới nhất trước, phân trang theo (created_at, id)"""
     try:
-        query = supabase.table("bills").select("*")
+        query = db.table("bills").select("*")
 
         if start_date:
             query = query.gte("created_at", start_date)
         if end_date:
             query = query.lte("created_at", end_date)
 
-        response = query.execute()
-        return response.data
+        response = await db.execute(paginate(query, cursor, limit))
+        bills, next_cursor = page_result(response.data, limit)
+        return {"bills": bills, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/reports/revenue/summary")
-async def get_revenue_summary(
-    start_date: Optional[str] = None, end_date: Optional[str] = None
+BILL_EXPORT_COLUMNS = [
+    "id",
+    "order_id",
+    "total_amount",
+    "payment_method",
+    "user_id",
+    "created_at",
+]
+
+
+@app.get("/payments/export", dependencies=[require_admin])
+async def export_bills(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    fmt: str = Query("csv", alias="format"),
 ):
-    try:
-        query = supabase.table("bills").select("*")
+    """Xuất hóa đơn dạng CSV hoặc NDJSON, đọc và gửi từng trang"""
 
+    def build_query():
+        query = db.table("bills").select(",".join(BILL_EXPORT_COLUMNS))
         if start_date:
             query = query.gte("created_at", start_date)
         if end_date:
             query = query.lte("created_at", end_date)
+        return query
+
+    return stream_export(db, build_query, BILL_EXPORT_COLUMNS, fmt, "bills")
+
+
+def summarize_revenue(groups: Iterable[dict]):
+    """Trả về (tổng doanh thu, số hóa đơn, doanh thu theo phương thức thanh toán)"""
+    payment_methods = {}
+    total_bills = 0
+    for group in groups:
+        method = group["payment_method"]
+        payment_methods[method] = payment_methods.get(method, 0) + group["total_amount"]
+        total_bills += group["total_bills"]
+    return sum(payment_methods.values()), total_bills, payment_methods
+
+
+def is_whole_date(value: Optional[str]) -> bool:
+    return value is None or len(value) == len("YYYY-MM-DD")
+
+
+def utc_day_bounds(start_date: Optional[str], end_date: Optional[str]):
+    """Đổi ngày (YYYY-MM-DD) thành mốc thời gian UTC, tính trọn ngày kết thúc
+    như bảng daily_revenue; giá trị có giờ phút giữ nguyên"""
+    if start_date and is_whole_date(start_date):
+        start_date = f"{start_date}T00:00:00Z"
+    if end_date and is_whole_date(end_date):
+        end_date = f"{end_date}T23:59:59.999999Z"
+    return start_date, end_date
+
+
+async def aggregate_revenue(start_date: Optional[str], end_date: Optional[str]):
+    """Gom nhóm doanh thu từ bảng bills trong khoảng thời gian bất kỳ"""
+    if db.supports_rpc:
+        try:
+            # Gom nhóm ngay trong database, chỉ trả về một dòng cho mỗi phương thức
+            response = await db.execute(
+                db.rpc(
+                    "revenue_by_payment_method",
+                    {"start_date": start_date, "end_date": end_date},
+                )
+            )
+            return summarize_revenue(response.data)
+        except APIError as e:
+            # Timeout hay lỗi khác không chuyển sang tải toàn bộ hóa đơn
+            if not is_missing_function(e):
+                raise
+            print(f"revenue_by_payment_method unavailable, using fallback: {str(e)}")
+
+    query = db.table("bills").select("payment_method,total_amount")
+    if start_date:
+        query = query.gte("created_at", start_date)
+    if end_date:
+        query = query.lte("created_at", end_date)
+    bills = await db.execute(query)
+
+    return summarize_revenue(
+        {
+            "payment_method": bill["payment_method"],
+            "total_amount": bill["total_amount"],
+            "total_bills": 1,
+        }
+        for bill in bills.data
+    )
 
-        bills = query.execute()
 
-        total_revenue = sum(bill["total_amount"] for bill in bills.data)
+async def rollup_revenue(start_date: Optional[str], end_date: Optional[str]):
+    """Đọc doanh thu theo ngày từ bảng tổng hợp daily_revenue (cả hai đầu mút)"""
+    query = db.table("daily_revenue").select("payment_method,total_amount,total_bills")
+    if start_date:
+        query = query.gte("date", start_date)
+    if end_date:
+        query = query.lte("date", end_date)
+    try:
+        response = await db.execute(query)
+    except APIError as e:
+        # Chỉ gom từ bills khi chưa tạo bảng tổng hợp, lỗi khác trả về client
+        if is_missing_relation(e):
+            return None
+        raise
+    return summarize_revenue(response.data)
 
-        # Group by payment method
-        payment_methods = {}
-        for bill in bills.data:
-            method = bill["payment_method"]
-            if method not in payment_methods:
-                payment_methods[method] = 0
-            payment_methods[method] += bill["total_amount"]
+
+@app.get("/reports/revenue/summary", dependencies=[require_admin])
+async def get_revenue_summary(
+    start_date: Optional[str] = None, end_date: Optional[str] = None
+):
+    try:
+        # Khoảng theo ngày đọc từ bảng tổng hợp, khoảng có giờ phút thì gom từ
+        # bills. Ngày kết thúc luôn được tính trọn ngày (UTC) ở cả hai cách
+        result = None
+        if is_whole_date(start_date) and is_whole_date(end_date):
+            result = await rollup_revenue(start_date, end_date)
+        if result is None:
+            result = await aggregate_revenue(*utc_day_bounds(start_date, end_date))
+        total_revenue, total_bills, payment_methods = result
 
         return {
             "total_revenue": total_revenue,
             "details": {
                 "by_payment_method": payment_methods,
-                "total_bills": len(bills.data),
+                "total_bills": total_bills,
             },
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/payments/reports/daily")
+@app.get("/payments/reports/daily", dependencies=[require_admin])
 async def get_daily_revenue(date: str):
     try:
-        # Chuyển đổi ngày thành định dạng timestamp
-        start_date = f"{date}T00:00:00Z"
-        end_date = f"{date}T23:59:59Z"
-
-        # Query bills trong khoảng thời gian
-        response = (
-            supabase.table("bills")
-            .select("*")
-            .gte("created_at", start_date)
-            .lte("created_at", end_date)
-            .execute()
-        )
-        bills = response.data
-
-        total_revenue = sum(bill["total_amount"] for bill in bills)
-        payment_methods = {}
-        for bill in bills:
-            method = bill["payment_method"]
-            payment_methods[method] = (
-                payment_methods.get(method, 0) + bill["total_amount"]
-            )
+        result = await rollup_revenue(date, date)
+        if result is None:
+            result = await aggregate_revenue(*utc_day_bounds(date, date))
+        total_revenue, total_bills, payment_methods = result
 
         return {
             "date": date,
             "total_revenue": total_revenue,
-            "total_bills": len(bills),
+            "total_bills": total_bills,
             "payment_methods": payment_methods,
         }
     except Exception as e:
@@ -227,9 +321,10 @@ async def get_daily_revenue(date: str):
 
 
 @app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
+async def custom_swagger_ui_html(request: Request):
     return get_swagger_ui_html(
-        openapi_url="/openapi.json",
+        # root_path khác rỗng khi service được mount trong monolith.py
+        openapi_url=request.scope.get("root_path", "") + "/openapi.json",
         title="Payment Service API Documentation",
         swagger_favicon_url="",
     )
@@ -1,16 +1,19 @@
-import json
-import os
 from datetime import datetime
 from enum import Enum
 from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import JSONResponse
 from pydantic import BaseModel, validator
-from supabase import Client, create_client
+
+from common.db import Database
+from common.health import HealthProbe
+from common.metrics import MetricsMiddleware, loop_monitor, metrics_response
+from common.responses import UnicodeJSONResponse
+from common.security import check_settings, get_current_user, require_roles
+from common.timing import ServerTimingMiddleware
 
 load_dotenv()
 
@@ -24,9 +27,10 @@ app = FastAPI(
 
 
 @app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
+async def custom_swagger_ui_html(request: Request):
     return get_swagger_ui_html(
-        openapi_url="/openapi.json",
+        # root_path khác rỗng khi service được mount trong monolith.py
+        openapi_url=request.scope.get("root_path", "") + "/openapi.json",
         title="Table Service API Documentation",
         swagger_favicon_url="",
     )
@@ -41,25 +45,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Đo thời gian request và từng truy vấn DB (header Server-Timing + log JSON)
+app.add_middleware(ServerTimingMiddleware, service="table-service")
 
-# Tùy chỉnh JSONResponse để xử lý Unicode
-class UnicodeJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+# Histogram độ trễ theo route/status và số request đang chạy cho /metrics
+app.add_middleware(MetricsMiddleware, service="table-service")
 
 
 # Override default JSONResponse
 app.router.default_response_class = UnicodeJSONResponse
 
-supabase: Client = create_client(
-    supabase_url=os.getenv("SUPABASE_URL"), supabase_key=os.getenv("SUPABASE_KEY")
-)
+db = Database.from_env()
+app.on_event("startup")(db.connect)
+app.on_event("shutdown")(db.close)
+
+# Kiểm tra DB định kỳ ở nền cho /readyz và /health
+health = HealthProbe(db, "table-service", tables=("tables",))
+app.on_event("startup")(health.start)
+app.on_event("shutdown")(health.stop)
+
+# Đo độ trễ event loop cho /metrics
+app.on_event("startup")(loop_monitor.start)
+app.on_event("shutdown")(loop_monitor.stop)
+
+# Không khởi động khi thiếu SECRET_KEY, tránh ký/kiểm tra token bằng khoá rỗng
+app.on_event("startup")(check_settings)
+
+# Xác thực JWT cục bộ, không cần gọi user-service
+require_user = Depends(get_current_user)
+require_admin = Depends(require_roles("admin"))
 
 
 class TableStatus(str, Enum):
@@ -99,48 +113,43 @@ async def root():
     return {"message": "Table Service is running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics dạng Prometheus (gộp mọi worker khi đặt PROMETHEUS_MULTIPROC_DIR)"""
+    return metrics_response()
+
+
+@app.get("/livez")
+async def liveness():
+    """Chỉ cho biết tiến trình còn phản hồi, không truy cập DB"""
+    return health.liveness()
+
+
+@app.get("/readyz")
+async def readiness():
+    """Kết quả kiểm tra DB gần nhất của vòng kiểm tra nền"""
+    return health.readiness()
+
+
 @app.get("/health")
 async def health_check():
-    try:
-        start_time = datetime.now()
-        response = supabase.table("tables").select("count").limit(1).execute()
-        end_time = datetime.now()
-        response_time = (end_time - start_time).total_seconds() * 1000
-
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "response_time_ms": round(response_time, 2),
-            "timestamp": datetime.now().isoformat(),
-            "service": "table-service",
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "unhealthy",
-                "database": "disconnected",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "service": "table-service",
-            },
-        )
+    return health.readiness()
 
 
-@app.get("/tables")
+@app.get("/tables", dependencies=[require_user])
 async def get_tables():
     try:
-        response = supabase.table("tables").select("*").execute()
+        response = await db.execute(db.table("tables").select("*"))
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/tables/{table_id}")
+@app.get("/tables/{table_id}", dependencies=[require_user])
 async def get_table(table_id: int):
     try:
-        response = (
-            supabase.table("tables").select("*").eq("id", table_id).single().execute()
+        response = await db.execute(
+            db.table("tables").select("*").eq("id", table_id).single()
         )
         if not response.data:
             raise HTTPException(status_code=404, detail="Table not found")
@@ -149,16 +158,12 @@ async def get_table(table_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/tables/open")
+@app.post("/tables/open", dependencies=[require_user])
 async def open_table(table_open: TableOpen):
     try:
         # Check table exists and is available
-        table = (
-            supabase.table("tables")
-            .select("*")
-            .eq("id", table_open.table_id)
-            .single()
-            .execute()
+        table = await db.execute(
+            db.table("tables").select("*").eq("id", table_open.table_id).single()
         )
 
         if not table.data:
@@ -166,12 +171,11 @@ async def open_table(table_open: TableOpen):
 
         if table.data["status"] == TableStatus.OCCUPIED:
             # Check if there's an active opening for this table
-            active_openings = (
-                supabase.table("opening_table")
+            active_openings = await db.execute(
+                db.table("opening_table")
                 .select("*")
                 .eq("table_id", table_open.table_id)
                 .eq("status", "open")
-                .execute()
             )
 
             if active_openings.data:
@@ -181,23 +185,20 @@ async def open_table(table_open: TableOpen):
                 )
 
         # Update table status and create opening record
-        response = (
-            supabase.table("tables")
+        response = await db.execute(
+            db.table("tables")
             .update({"status": TableStatus.OCCUPIED})
             .eq("id", table_open.table_id)
-            .execute()
         )
 
-        opening = (
-            supabase.table("opening_table")
-            .insert(
+        opening = await db.execute(
+            db.table("opening_table").insert(
                 {
                     "table_id": table_open.table_id,
                     "opened_by": table_open.user_id,
                     "status": "open",
                 }
             )
-            .execute()
         )
 
         return {
@@ -211,16 +212,12 @@ async def open_table(table_open: TableOpen):
         raise HTTPException(status_code=500, detail=f"Lỗi hệ thống: {str(e)}")
 
 
-@app.post("/tables/close")
+@app.post("/tables/close", dependencies=[require_user])
 async def close_table(table_close: TableClose):
     try:
         # Check table exists and is occupied
-        table = (
-            supabase.table("tables")
-            .select("*")
-            .eq("id", table_close.table_id)
-            .single()
-            .execute()
+        table = await db.execute(
+            db.table("tables").select("*").eq("id", table_close.table_id).single()
         )
 
         if not table.data:
@@ -230,14 +227,13 @@ async def close_table(table_close: TableClose):
             raise HTTPException(status_code=400, detail="Bàn đã được đóng trước đó")
 
         # Check if this user opened the table
-        opening = (
-            supabase.table("opening_table")
+        opening = await db.execute(
+            db.table("opening_table")
             .select("*")
             .eq("table_id", table_close.table_id)
             .eq("opened_by", table_close.user_id)
             .eq("status", "open")
             .single()
-            .execute()
         )
 
         if not opening.data:
@@ -246,18 +242,24 @@ async def close_table(table_close: TableClose):
             )
 
         # Update table status and close the opening record
-        supabase.table("tables").update({"status": TableStatus.AVAILABLE}).eq(
-            "id", table_close.table_id
-        ).execute()
+        await db.execute(
+            db.table("tables")
+            .update({"status": TableStatus.AVAILABLE})
+            .eq("id", table_close.table_id)
+        )
 
         # Update the opening record
-        supabase.table("opening_table").update(
-            {
-                "closed_at": datetime.now().isoformat(),
-                "closed_by": table_close.user_id,
-                "status": "closed",
-            }
-        ).eq("id", opening.data["id"]).execute()
+        await db.execute(
+            db.table("opening_table")
+            .update(
+                {
+                    "closed_at": datetime.now().isoformat(),
+                    "closed_by": table_close.user_id,
+                    "status": "closed",
+                }
+            )
+            .eq("id", opening.data["id"])
+        )
 
         return {
             "status": "success",
@@ -269,31 +271,28 @@ async def close_table(table_close: TableClose):
         raise HTTPException(status_code=500, detail=f"Lỗi hệ thống: {str(e)}")
 
 
-@app.get("/tables/status")
+@app.get("/tables/status", dependencies=[require_user])
 async def get_tables_status():
     try:
-        response = supabase.table("tables").select("id,number,status").execute()
+        response = await db.execute(db.table("tables").select("id,number,status"))
         return {"tables": response.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.put("/tables/{table_id}")
+@app.put("/tables/{table_id}", dependencies=[require_user])
 async def update_table_status(table_id: int, table: TableBase):
     try:
         # Kiểm tra bàn có tồn tại không
-        existing_table = (
-            supabase.table("tables").select("*").eq("id", table_id).single().execute()
+        existing_table = await db.execute(
+            db.table("tables").select("*").eq("id", table_id).single()
         )
         if not existing_table.data:
             raise HTTPException(status_code=404, detail="Không tìm thấy bàn")
 
         # Cập nhật trạng thái bàn
-        response = (
-            supabase.table("tables")
-            .update({"status": table.status})
-            .eq("id", table_id)
-            .execute()
+        response = await db.execute(
+            db.table("tables").update({"status": table.status}).eq("id", table_id)
         )
 
         return response.data[0]
@@ -301,22 +300,20 @@ async def update_table_status(table_id: int, table: TableBase):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/tables")
+@app.post("/tables", dependencies=[require_admin])
 async def create_table(table: TableCreate):
     try:
         # Check if table number already exists
-        existing = (
-            supabase.table("tables").select("*").eq("number", table.number).execute()
+        existing = await db.execute(
+            db.table("tables").select("*").eq("number", table.number)
         )
         if existing.data:
             raise HTTPException(
                 status_code=400, detail=f"Bàn số {table.number} đã tồn tại"
             )
 
-        response = (
-            supabase.table("tables")
-            .insert({"number": table.number, "status": table.status})
-            .execute()
+        response = await db.execute(
+            db.table("tables").insert({"number": table.number, "status": table.status})
         )
         return response.data[0]
     except HTTPException:
@@ -325,22 +322,19 @@ async def create_table(table: TableCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.delete("/tables/{table_id}")
+@app.delete("/tables/{table_id}", dependencies=[require_admin])
 async def delete_table(table_id: int):
     try:
         # Check if table exists
-        existing = (
-            supabase.table("tables").select("*").eq("id", table_id).single().execute()
+        existing = await db.execute(
+            db.table("tables").select("*").eq("id", table_id).single()
         )
         if not existing.data:
             raise HTTPException(status_code=404, detail="Không tìm thấy bàn")
 
         # Check if table is in use
-        response = (
-            supabase.table("tables")
-            .update({"status": "inactive"})
-            .eq("id", table_id)
-            .execute()
+        response = await db.execute(
+            db.table("tables").update({"status": "inactive"}).eq("id", table_id)
         )
         return {"message": "Đã vô hiệu hóa bàn thành công"}
     except Exception as e:
@@ -1,19 +1,15 @@
+import asyncio
 import os
-from datetime import datetime, timedelta
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import bcrypt
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-# Cấu hình bảo mật
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
+# Cấu hình băm mật khẩu, token JWT nằm ở common.security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -24,28 +20,110 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    # Verify user exists in database
-    # Note: Implementation will depend on your Supabase setup
-    return username
+class PasswordWorkerPool:
+    """Chạy bcrypt trong thread pool có giới hạn để không chặn event loop.
+
+    bcrypt nhả GIL khi băm nên các worker chạy song song thật sự. Khi số yêu
+    cầu đang chờ vượt `workers + max_queue`, yêu cầu mới bị từ chối ngay với
+    503 thay vì xếp hàng vô hạn làm tăng độ trễ của mọi lần đăng nhập.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.busy_seconds = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _start(self) -> ThreadPoolExecutor:
+        # Tạo khi dùng lần đầu để đọc PASSWORD_* sau load_dotenv() của service
+        if self._executor is None:
+            if self.workers is None:
+                self.workers = int(
+                    os.getenv("PASSWORD_WORKERS", min(4, os.cpu_count() or 1))
+                )
+            if self.max_queue is None:
+                self.max_queue = int(os.getenv("PASSWORD_MAX_QUEUE", self.workers * 8))
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    def _timed(self, submitted: float, fn, *args):
+        started = time.monotonic()
+        self.wait_seconds += started - submitted
+        try:
+            return fn(*args)
+        finally:
+            self.busy_seconds += time.monotonic() - started
+
+    async def run(self, fn, *args):
+        executor = self._start()
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Hệ thống đang bận, vui lòng thử lại sau",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                executor, self._timed, time.monotonic(), fn, *args
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        self._start()
+        # Thời gian chờ/băm được cộng cho cả lần lỗi
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": (
+                round(self.wait_seconds / finished * 1000, 2) if finished else 0.0
+            ),
+            "avg_hash_ms": (
+                round(self.busy_seconds / finished * 1000, 2) if finished else 0.0
+            ),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_pool = PasswordWorkerPool()
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+
+def _check(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+async def hash_password(password: str) -> str:
+    return await password_pool.run(_hash, password)
+
+
+async def check_password(password: str, hashed: str) -> bool:
+    return await password_pool.run(_check, password, hashed)
@@ -1,28 +1,23 @@
-import json
-import os
-from datetime import datetime
 from typing import Optional
 
-import bcrypt
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from supabase import Client, create_client
 
-# Load environment variables
-load_dotenv()
+from common.db import Database
+from common.health import HealthProbe
+from common.metrics import MetricsMiddleware, loop_monitor, metrics_response
+from common.pagination import DEFAULT_PAGE_SIZE, page_result, paginate
+from common.responses import UnicodeJSONResponse
+from common.security import check_settings, create_access_token
+from common.timing import ServerTimingMiddleware
 
-# Get environment variables
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+from .auth import check_password, hash_password, password_pool
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise Exception(
-        "Missing required environment variables: SUPABASE_URL and SUPABASE_KEY must be set"
-    )
+# Load environment variables
+load_dotenv()
 
 app = FastAPI(
     title="User Service API",
@@ -41,30 +36,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Đo thời gian request và từng truy vấn DB (header Server-Timing + log JSON)
+app.add_middleware(ServerTimingMiddleware, service="user-service")
 
-# Tùy chỉnh JSONResponse để xử lý Unicode
-class UnicodeJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+# Histogram độ trễ theo route/status và số request đang chạy cho /metrics
+app.add_middleware(MetricsMiddleware, service="user-service")
 
 
 # Override default JSONResponse
 app.router.default_response_class = UnicodeJSONResponse
 
-# Initialize Supabase client
-try:
-    supabase: Client = create_client(
-        supabase_url=SUPABASE_URL, supabase_key=SUPABASE_KEY
-    )
-except Exception as e:
-    print(f"Failed to initialize Supabase client: {str(e)}")
-    raise
+# Initialize database access layer
+db = Database.from_env()
+app.on_event("startup")(db.connect)
+app.on_event("shutdown")(db.close)
+
+# Kiểm tra DB định kỳ ở nền cho /readyz và /health
+health = HealthProbe(db, "user-service", tables=("users",))
+app.on_event("startup")(health.start)
+app.on_event("shutdown")(health.stop)
+
+# Đo độ trễ event loop cho /metrics
+app.on_event("startup")(loop_monitor.start)
+app.on_event("shutdown")(loop_monitor.stop)
+
+# Không khởi động khi thiếu SECRET_KEY, tránh ký/kiểm tra token bằng khoá rỗng
+app.on_event("startup")(check_settings)
+app.on_event("shutdown")(password_pool.shutdown)
 
 
 class UserBase(BaseModel):
@@ -95,75 +93,78 @@ async def root():
 
 
 @app.get("/users")
-async def get_users(role: Optional[str] = None, status: Optional[str] = None):
+async def get_users(
+    role: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
     """Lấy danh sách người dùng với tùy chọn lọc theo role và status"""
     try:
-        query = supabase.table("users").select("id,username,full_name,role,status")
+        query = db.table("users").select("id,username,full_name,role,status")
 
         if role:
             query = query.eq("role", role)
         if status:
             query = query.eq("status", status)
 
-        response = query.execute()
-        return response.data
+        # Bảng users không có created_at, phân trang theo id
+        response = await db.execute(paginate(query, cursor, limit, keys=("id",)))
+        users, next_cursor = page_result(response.data, limit, keys=("id",))
+        return {"users": users, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics dạng Prometheus (gộp mọi worker khi đặt PROMETHEUS_MULTIPROC_DIR)"""
+    return metrics_response()
+
+
+@app.get("/livez")
+async def liveness():
+    """Chỉ cho biết tiến trình còn phản hồi, không truy cập DB"""
+    return health.liveness()
+
+
+@app.get("/readyz")
+async def readiness():
+    """Kết quả kiểm tra DB gần nhất của vòng kiểm tra nền"""
+    return health.readiness()
+
+
 @app.get("/health")
 async def health_check():
-    try:
-        # Kiểm tra kết nối database bằng cách thực hiện một truy vấn đơn giản
-        start_time = datetime.now()
-        response = supabase.table("users").select("count").limit(1).execute()
-        end_time = datetime.now()
-        response_time = (end_time - start_time).total_seconds() * 1000
-
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "response_time_ms": round(response_time, 2),
-            "timestamp": datetime.now().isoformat(),
-            "service": "user-service",
-        }
-    except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail={
-                "status": "unhealthy",
-                "database": "disconnected",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat(),
-                "service": "user-service",
-            },
-        )
+    return health.readiness()
 
 
 @app.post("/users")
 async def create_user(user: UserCreate):
     try:
         # Check if username already exists
-        existing_user = (
-            supabase.table("users").select("id").eq("username", user.username).execute()
+        existing_user = await db.execute(
+            db.table("users").select("id").eq("username", user.username)
         )
         if existing_user.data:
             raise HTTPException(status_code=400, detail="Tên đăng nhập đã tồn tại")
 
         # Hash password
-        hashed = bcrypt.hashpw(user.password.encode(), bcrypt.gensalt())
+        hashed = await hash_password(user.password)
 
         # Create user data
         user_data = {
             "username": user.username,
-            "password": hashed.decode(),
+            "password": hashed,
             "full_name": user.full_name,
             "role": user.role,
             "status": user.status,
         }
 
         # Insert into database
-        response = supabase.table("users").insert(user_data).execute()
+        response = await db.execute(db.table("users").insert(user_data))
 
         if len(response.data) > 0:
             created_user = response.data[0]
@@ -184,11 +185,10 @@ async def create_user(user: UserCreate):
 async def get_user(user_id: str):
     try:
         user_id_int = int(user_id)
-        response = (
-            supabase.table("users")
+        response = await db.execute(
+            db.table("users")
             .select("id,username,full_name,role,status")
             .eq("id", user_id_int)
-            .execute()
         )
 
         if len(response.data) > 0:
@@ -210,8 +210,8 @@ async def update_user(user_id: str, user: UserUpdate):
         if not update_data:
             raise HTTPException(status_code=400, detail="Không có dữ liệu cập nhật")
 
-        response = (
-            supabase.table("users").update(update_data).eq("id", user_id_int).execute()
+        response = await db.execute(
+            db.table("users").update(update_data).eq("id", user_id_int)
         )
 
         if len(response.data) > 0:
@@ -228,11 +228,8 @@ async def delete_user(user_id: str):
     try:
         user_id_int = int(user_id)
         # Soft delete by updating status to 'inactive'
-        response = (
-            supabase.table("users")
-            .update({"status": "inactive"})
-            .eq("id", user_id_int)
-            .execute()
+        response = await db.execute(
+            db.table("users").update({"status": "inactive"}).eq("id", user_id_int)
         )
 
         if len(response.data) > 0:
@@ -247,11 +244,8 @@ async def delete_user(user_id: str):
 @app.post("/users/login")
 async def login(request: LoginRequest):
     try:
-        response = (
-            supabase.table("users")
-            .select("*")
-            .eq("username", request.username)
-            .execute()
+        response = await db.execute(
+            db.table("users").select("*").eq("username", request.username)
         )
 
         if len(response.data) == 0:
@@ -261,22 +255,33 @@ async def login(request: LoginRequest):
 
         user = response.data[0]
 
-        if not bcrypt.checkpw(request.password.encode(), user["password"].encode()):
+        if not await check_password(request.password, user["password"]):
             raise HTTPException(
                 status_code=401, detail="Sai tên đăng nhập hoặc mật khẩu"
             )
 
         # Remove password from response
         user.pop("password", None)
+        user["access_token"] = create_access_token(user)
+        user["token_type"] = "bearer"
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get("/password-pool/stats")
+async def password_pool_stats():
+    """Độ sâu hàng đợi và thời gian chờ của thread pool băm mật khẩu"""
+    return password_pool.stats()
+
+
 @app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
+async def custom_swagger_ui_html(request: Request):
     return get_swagger_ui_html(
-        openapi_url="/openapi.json",
+        # root_path khác rỗng khi service được mount trong monolith.py
+        openapi_url=request.scope.get("root_path", "") + "/openapi.json",
         title="User Service API Documentation",
         swagger_favicon_url="",
     )
@@ -23,8 +23,7 @@ async def test_user_crud():
         )
         if response.status_code == 200:
             user_data = response.json()
-            # Không có access_token trong response, tạm thời bỏ qua auth header
-            headers = {}
+            headers = {"Authorization": f"Bearer {user_data['access_token']}"}
         else:
             print(f"[LOGIN] Lỗi đăng nhập: {json.dumps(response.json(), indent=2)}")
             return
@@ -91,8 +90,7 @@ async def test_menu_crud():
         )
         if response.status_code == 200:
             user_data = response.json()
-            # Không có access_token trong response, tạm thời bỏ qua auth header
-            headers = {}
+            headers = {"Authorization": f"Bearer {user_data['access_token']}"}
         else:
             print(f"[LOGIN] Lỗi đăng nhập: {json.dumps(response.json(), indent=2)}")
             return
@@ -157,8 +155,7 @@ async def test_table_crud():
         )
         if response.status_code == 200:
             user_data = response.json()
-            # Không có access_token trong response, tạm thời bỏ qua auth header
-            headers = {}
+            headers = {"Authorization": f"Bearer {user_data['access_token']}"}
         else:
             print(f"[LOGIN] Lỗi đăng nhập: {json.dumps(response.json(), indent=2)}")
             return
@@ -220,7 +217,7 @@ async def test_kitchen_ingredients():
         )
         if response.status_code == 200:
             user_data = response.json()
-            headers = {}
+            headers = {"Authorization": f"Bearer {user_data['access_token']}"}
         else:
             print(f"[LOGIN] Lỗi đăng nhập: {json.dumps(response.json(), indent=2)}")
             return
@@ -276,7 +273,7 @@ async def test_order_flow():
         if response.status_code == 200:
             user_data = response.json()
             user_id = user_data.get("id")  # Get user ID from login response
-            headers = {}
+            headers = {"Authorization": f"Bearer {user_data['access_token']}"}
         else:
             print(f"[LOGIN] Lỗi đăng nhập: {json.dumps(response.json(), indent=2)}")
             return
@@ -364,8 +361,7 @@ async def test_reports():
         )
         if response.status_code == 200:
             user_data = response.json()
-            # Không có access_token trong response, tạm thời bỏ qua auth header
-            headers = {}
+            headers = {"Authorization": f"Bearer {user_data['access_token']}"}
         else:
             print(f"[LOGIN] Lỗi đăng nhập: {json.dumps(response.json(), indent=2)}")
             return
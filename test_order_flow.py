@@ -38,6 +38,7 @@ async def test_full_order_process():
 
             user_data = response.json()
             user_id = user_data.get("id")
+            client.headers["Authorization"] = f"Bearer {user_data['access_token']}"
             print(f"[SUCCESS] Đăng nhập thành công - Status: {response.status_code}")
             print(
                 f"Response data: {json.dumps(user_data, indent=2, ensure_ascii=False)}"
@@ -0,0 +1,260 @@
+"""Kiểm tra nhánh stored function (rpc) của order-service mà backend SQLite
+không chạy được (supports_rpc=False): `db` của service được thay bằng một DB
+giả trả về kết quả hoặc lỗi như PostgREST, rồi kiểm tra cách ánh xạ sang mã
+HTTP và khi nào được chuyển sang cách làm dự phòng.
+
+Chạy: python -m pytest test_order_rpc.py
+"""
+
+import asyncio
+import importlib
+import importlib.util
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_order_service():
+    """Import order-service dưới tên gói riêng, không đụng tới gói
+    `order_service` mà monolith.py (test_query_budget.py) dùng"""
+    package = "order_service_rpc_test"
+    package_dir = os.path.join(ROOT_DIR, "services", "order-service", "app")
+    spec = importlib.util.spec_from_file_location(
+        package,
+        os.path.join(package_dir, "__init__.py"),
+        submodule_search_locations=[package_dir],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[package] = module
+    spec.loader.exec_module(module)
+    # Chỉ cần import service, `db` được thay bằng FakeRpcDatabase trong từng test
+    backend = os.environ.get("DB_BACKEND")
+    local_path = os.environ.get("LOCAL_DB_PATH")
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["LOCAL_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "rpc.db")
+    try:
+        return importlib.import_module(f"{package}.main")
+    finally:
+        for key, value in (("DB_BACKEND", backend), ("LOCAL_DB_PATH", local_path)):
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+orders = load_order_service()
+
+
+def api_error(code: str, message: str = "error") -> APIError:
+    return APIError({"code": code, "message": message, "details": None, "hint": None})
+
+
+class FakeQuery:
+    """Ghi lại các lệnh gọi của query builder"""
+
+    def __init__(self, kind: str, name: str, params=None):
+        self.kind = kind
+        self.name = name
+        self.params = params
+
+    def __getattr__(self, attr):
+        return lambda *args, **kwargs: self
+
+
+class FakeRpcDatabase:
+    """DB hỗ trợ rpc: trả về `rpc_data` hoặc ném `rpc_error`; truy vấn bảng
+    trả về dữ liệu trong `tables` (nhánh dự phòng)"""
+
+    supports_rpc = True
+
+    def __init__(self, rpc_data=None, rpc_error=None, tables=None):
+        self.rpc_data = rpc_data
+        self.rpc_error = rpc_error
+        self.tables = tables or {}
+        self.queries = []
+
+    def rpc(self, fn: str, params: dict) -> FakeQuery:
+        return FakeQuery("rpc", fn, params)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery("table", name)
+
+    async def execute(self, query: FakeQuery):
+        self.queries.append(query)
+        if query.kind == "rpc":
+            if self.rpc_error is not None:
+                raise self.rpc_error
+            return SimpleNamespace(data=self.rpc_data)
+        if query.name not in self.tables:
+            raise AssertionError(f"Không mong đợi truy vấn bảng {query.name}")
+        return SimpleNamespace(data=self.tables[query.name])
+
+    @property
+    def table_queries(self):
+        return [query.name for query in self.queries if query.kind == "table"]
+
+
+@pytest.fixture
+def use_db(monkeypatch):
+    def install(db: FakeRpcDatabase) -> FakeRpcDatabase:
+        monkeypatch.setattr(orders, "db", db)
+        return db
+
+    return install
+
+
+def update_status(status: str, expected_status=None):
+    return asyncio.run(
+        orders.update_order_status(
+            1, orders.OrderStatusUpdate(status=status, expected_status=expected_status)
+        )
+    )
+
+
+def test_transition_updated(use_db):
+    db = use_db(
+        FakeRpcDatabase(rpc_data=[{"outcome": "updated", "current_status": "pending"}])
+    )
+    assert update_status("preparing", "pending")["status"] == "preparing"
+    call = db.queries[0]
+    assert (call.kind, call.name) == ("rpc", "transition_order_status")
+    assert call.params == {
+        "p_order_id": 1,
+        "p_status": "preparing",
+        "p_allowed_from": orders.allowed_previous_statuses("preparing"),
+        "p_expected_status": "pending",
+    }
+    assert not db.table_queries
+
+
+@pytest.mark.parametrize(
+    "outcome, current_status, status_code",
+    [
+        ("not_found", None, 404),
+        ("conflict", "cancelled", 409),
+        ("invalid", "completed", 400),
+    ],
+)
+def test_transition_outcomes(use_db, outcome, current_status, status_code):
+    db = use_db(
+        FakeRpcDatabase(
+            rpc_data=[{"outcome": outcome, "current_status": current_status}]
+        )
+    )
+    with pytest.raises(HTTPException) as error:
+        update_status("preparing", "pending")
+    assert error.value.status_code == status_code
+    assert not db.table_queries
+
+
+@pytest.mark.parametrize("code", ["PGRST202", "42883"])
+def test_transition_falls_back_when_function_missing(use_db, code):
+    db = use_db(
+        FakeRpcDatabase(
+            rpc_error=api_error(code),
+            tables={"orders": {"status": "pending"}, "order_items": [{}]},
+        )
+    )
+    assert update_status("preparing")["status"] == "preparing"
+    assert db.table_queries == ["orders", "orders", "order_items"]
+
+
+@pytest.mark.parametrize("code", ["55P03", "57014", "42501"])
+def test_transition_rpc_error_is_not_retried(use_db, code):
+    # Hết thời gian chờ khoá, timeout, thiếu quyền: không chạy compare-and-set
+    db = use_db(FakeRpcDatabase(rpc_error=api_error(code)))
+    with pytest.raises(HTTPException) as error:
+        update_status("preparing", "pending")
+    assert error.value.status_code == 500
+    assert not db.table_queries
+
+
+ORDER_ITEMS = [
+    {
+        "id": 10,
+        "order_id": 1,
+        "item_id": 3,
+        "quantity": 1,
+        "price": 50000,
+        "note": None,
+        "status": "pending",
+    },
+    {
+        "id": 11,
+        "order_id": 1,
+        "item_id": 4,
+        "quantity": 2,
+        "price": 30000,
+        "note": None,
+        "status": "pending",
+    },
+]
+
+ADJUSTMENTS = [
+    orders.OrderItemAdjust(item_id=3, quantity=2, action="modify"),
+    orders.OrderItemAdjust(item_id=4, quantity=1, action="remove"),
+]
+
+
+def adjust_database(**kwargs) -> FakeRpcDatabase:
+    tables = {"orders": {"status": "pending", "order_items": ORDER_ITEMS}}
+    tables.update(kwargs.pop("tables", {}))
+    return FakeRpcDatabase(tables=tables, **kwargs)
+
+
+def adjust():
+    return asyncio.run(orders.adjust_order(1, ADJUSTMENTS))
+
+
+def test_adjustment_rpc(use_db):
+    db = use_db(adjust_database(rpc_data=100000))
+    assert adjust()["total_amount"] == 100000
+    call = db.queries[-1]
+    assert (call.kind, call.name) == ("rpc", "apply_order_adjustment")
+    assert call.params == {
+        "p_order_id": 1,
+        "p_inserts": [],
+        "p_updates": [{**ORDER_ITEMS[0], "quantity": 2}],
+        "p_delete_ids": [11],
+    }
+    # Chỉ đọc đơn hàng, mọi thay đổi nằm trong function
+    assert db.table_queries == ["orders"]
+
+
+@pytest.mark.parametrize(
+    "code, status_code",
+    [
+        # RAISE EXCEPTION trong function: đơn không còn ở trạng thái điều chỉnh được
+        ("P0001", 409),
+        # Vi phạm khoá ngoại / check
+        ("23503", 400),
+        ("23514", 400),
+        # Timeout, hết thời gian chờ khoá
+        ("57014", 500),
+        ("55P03", 500),
+    ],
+)
+def test_adjustment_rpc_errors(use_db, code, status_code):
+    db = use_db(adjust_database(rpc_error=api_error(code)))
+    with pytest.raises(HTTPException) as error:
+        adjust()
+    assert error.value.status_code == status_code
+    # Function đã rollback, không ghi lại bằng cách dự phòng
+    assert db.table_queries == ["orders"]
+
+
+@pytest.mark.parametrize("code", ["PGRST202", "42883"])
+def test_adjustment_falls_back_when_function_missing(use_db, code):
+    db = use_db(
+        adjust_database(rpc_error=api_error(code), tables={"order_items": ORDER_ITEMS})
+    )
+    adjust()
+    # Upsert món sửa rồi xoá món bỏ, không qua rpc
+    assert db.table_queries == ["orders", "order_items", "order_items"]
@@ -0,0 +1,92 @@
+"""Kiểm tra cursor phân trang bị sửa phía client bị từ chối bằng 400 thay vì
+được ghép vào bộ lọc của PostgREST.
+
+Chạy: python -m pytest test_pagination.py
+"""
+
+import base64
+import json
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "services"))
+
+from common.pagination import encode_cursor, paginate  # noqa: E402
+
+
+class RecordingQuery:
+    """Ghi lại các bộ lọc paginate() áp dụng lên query"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def apply(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+
+        return apply
+
+
+def raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def test_valid_cursor():
+    query = RecordingQuery()
+    paginate(query, encode_cursor(["2024-01-01T10:00:00+00:00", 7]), 10)
+    assert query.calls[0] == (
+        "or_",
+        (
+            'created_at.lt."2024-01-01T10:00:00+00:00",'
+            'and(created_at.eq."2024-01-01T10:00:00+00:00",id.lt.7)',
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "created_at",
+    [
+        # PostgREST bỏ số 0 cuối của phần lẻ giây
+        "2024-05-01T10:00:30.1234+00:00",
+        "2024-05-01T10:00:30.5+07:00",
+        "2024-05-01T10:00:30.123456Z",
+        "2024-05-01T10:00:30",
+        "2024-05-01 10:00:30.12",
+    ],
+)
+def test_issued_timestamp_cursor_accepted(created_at):
+    query = RecordingQuery()
+    paginate(query, encode_cursor([created_at, 7]), 10)
+    assert query.calls[0][0] == "or_"
+
+
+@pytest.mark.parametrize(
+    "values, keys",
+    [
+        (['x",id.gt.0', 1], ("created_at", "id")),
+        (["2024-01-01T10:00:00", "1"], ("created_at", "id")),
+        (["2024-01-01T10:00:00", "1),or(id.gt.0"], ("created_at", "id")),
+        (["not-a-date", 1], ("created_at", "id")),
+        (["2024-05-01T10:00:30.1234+00:00 or 1", 1], ("created_at", "id")),
+        ([{"a": 1}, 1], ("created_at", "id")),
+        (["2024-01-01T10:00:00"], ("created_at", "id")),
+        ([True], ("id",)),
+        (["1"], ("id",)),
+    ],
+)
+def test_edited_cursor_rejected(values, keys):
+    query = RecordingQuery()
+    with pytest.raises(HTTPException) as error:
+        paginate(query, raw_cursor(values), 10, keys=keys)
+    assert error.value.status_code == 400
+    assert not query.calls
+
+
+def test_garbage_cursor_rejected():
+    with pytest.raises(HTTPException) as error:
+        paginate(RecordingQuery(), "%%%not-base64", 10)
+    assert error.value.status_code == 400
@@ -0,0 +1,248 @@
+"""Kiểm tra số truy vấn DB tối đa của từng endpoint để bắt lỗi N+1.
+
+Chạy hoàn toàn offline trên SQLite (DB_BACKEND=sqlite): tạo DB mới, nạp dữ liệu
+mẫu bằng init_db.py, gọi các endpoint qua monolith.py với `size` đơn đang chờ,
+mỗi đơn `size` món, rồi đọc header X-DB-Query-Count (QUERY_DEBUG_HEADERS=1).
+Ngân sách là hằng số, không phụ thuộc `size`: một vòng lặp truy vấn theo từng
+phần tử sẽ vượt ngân sách ở size lớn. Ngoài ra số truy vấn tối đa của mỗi
+endpoint không được tăng theo `size`, kể cả khi vẫn nằm trong ngân sách.
+
+Chạy: python test_query_budget.py --sizes 2 10
+hoặc: python -m pytest test_query_budget.py
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Số truy vấn tối đa cho mỗi endpoint (route template của service)
+QUERY_BUDGETS: Dict[str, int] = {
+    "POST /orders": 3,
+    "GET /orders": 1,
+    "GET /orders/{order_id}": 2,
+    # Đọc đơn kèm món, lấy giá, tối đa một insert/upsert/delete
+    "PUT /orders/{order_id}/adjust": 5,
+    "PUT /orders/{order_id}/status": 2,
+    "DELETE /orders/{order_id}/items/{item_id}": 2,
+    "GET /kitchen/pending-orders": 2,
+    "PUT /kitchen/order-items/{item_id}/status": 3,
+    "POST /payments/bills": 3,
+    "GET /reports/revenue/summary": 1,
+    "GET /payments/reports/daily": 1,
+    "GET /tables": 1,
+    "GET /menu-items": 1,
+    "GET /menu": 1,
+}
+DEFAULT_SIZES = [2, 10]
+
+
+def prepare_database():
+    """Tạo DB SQLite mới với dữ liệu mẫu, phải chạy trước khi import monolith"""
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["LOCAL_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "budget.db")
+    os.environ["QUERY_DEBUG_HEADERS"] = "1"
+    os.environ.setdefault("TIMING_LOG_LEVEL", "WARNING")
+    subprocess.run(
+        [sys.executable, "init_db.py"],
+        cwd=ROOT_DIR,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+class QueryBudget:
+    """Gọi endpoint qua monolith.py và ghi lại số truy vấn DB của từng lần gọi"""
+
+    def __init__(self, client):
+        self.client = client
+        self.results: List[dict] = []
+
+    def call(self, service: str, method: str, route: str, size: int, **kwargs):
+        path = route.format(**kwargs.pop("path", {}))
+        response = self.client.request(method, f"/{service}{path}", **kwargs)
+        endpoint = f"{method} {route}"
+        assert (
+            response.status_code < 400
+        ), f"{endpoint} trả về {response.status_code}: {response.text}"
+        self.results.append(
+            {
+                "endpoint": endpoint,
+                "size": size,
+                "queries": int(response.headers["x-db-query-count"]),
+                "budget": QUERY_BUDGETS[endpoint],
+                "detail": response.headers["x-db-queries"],
+            }
+        )
+        return response.json()
+
+    def run(self, size: int):
+        login = self.client.post(
+            "/user/users/login", json={"username": "admin", "password": "test123"}
+        ).json()
+        self.client.headers["Authorization"] = f"Bearer {login['access_token']}"
+
+        menu_ids = [
+            item["id"]
+            for item in self.call("menu", "GET", "/menu-items", size)
+            if item["status"] == "available"
+        ]
+        dishes = [menu_ids[i % len(menu_ids)] for i in range(size)]
+        orders = [
+            self.call(
+                "order",
+                "POST",
+                "/orders",
+                size,
+                json={
+                    "table_id": 1,
+                    "items": [{"item_id": dish, "quantity": 1} for dish in dishes],
+                },
+            )
+            for _ in range(size)
+        ]
+        order_id = orders[0]["order_id"]
+        ids = {"order_id": order_id}
+
+        self.call("order", "GET", "/orders", size)
+        self.call("order", "GET", "/orders/{order_id}", size, path=ids)
+        self.call("kitchen", "GET", "/kitchen/pending-orders", size)
+        self.call(
+            "order",
+            "PUT",
+            "/orders/{order_id}/adjust",
+            size,
+            path=ids,
+            json=[
+                {"item_id": dish, "quantity": 2, "action": "modify"} for dish in dishes
+            ]
+            + [{"item_id": dish, "quantity": 1, "action": "add"} for dish in dishes],
+        )
+        self.call(
+            "order",
+            "DELETE",
+            "/orders/{order_id}/items/{item_id}",
+            size,
+            path={"order_id": order_id, "item_id": dishes[-1]},
+        )
+        self.call(
+            "order",
+            "PUT",
+            "/orders/{order_id}/status",
+            size,
+            path=ids,
+            json={"status": "preparing", "expected_status": "pending"},
+        )
+        for item in self.call("order", "GET", "/orders/{order_id}", size, path=ids)[
+            "items"
+        ]:
+            self.call(
+                "kitchen",
+                "PUT",
+                "/kitchen/order-items/{item_id}/status",
+                size,
+                path={"item_id": item["id"]},
+                params={"status": "completed"},
+            )
+        self.call(
+            "payment",
+            "POST",
+            "/payments/bills",
+            size,
+            json={"order_id": order_id, "payment_method": "cash", "created_by": 1},
+        )
+
+        today = date.today().isoformat()
+        self.call(
+            "payment",
+            "GET",
+            "/reports/revenue/summary",
+            size,
+            params={"start_date": today, "end_date": today},
+        )
+        self.call(
+            "payment", "GET", "/payments/reports/daily", size, params={"date": today}
+        )
+        self.call("table", "GET", "/tables", size)
+        self.call("menu", "GET", "/menu", size)
+
+    def over_budget(self) -> List[dict]:
+        return [r for r in self.results if r["queries"] > r["budget"]]
+
+    def grows_with_size(self) -> List[str]:
+        """Endpoint có số truy vấn tối đa tăng theo size (dấu hiệu N+1)"""
+        worst: Dict[str, Dict[int, int]] = {}
+        for r in self.results:
+            by_size = worst.setdefault(r["endpoint"], {})
+            by_size[r["size"]] = max(by_size.get(r["size"], 0), r["queries"])
+        return [
+            endpoint
+            for endpoint, by_size in sorted(worst.items())
+            if by_size[max(by_size)] > by_size[min(by_size)]
+        ]
+
+    def report(self) -> str:
+        # Mỗi endpoint/size chỉ in lần gọi nhiều truy vấn nhất
+        worst: Dict[tuple, dict] = {}
+        for r in self.results:
+            key = (r["endpoint"], r["size"])
+            if key not in worst or r["queries"] > worst[key]["queries"]:
+                worst[key] = r
+        lines = [f"{'endpoint':<45}{'size':>5}{'queries':>9}{'budget':>8}"]
+        for (endpoint, size), r in sorted(worst.items()):
+            flag = "  OVER" if r["queries"] > r["budget"] else ""
+            lines.append(
+                f"{endpoint:<45}{size:>5}{r['queries']:>9}{r['budget']:>8}{flag}"
+            )
+        return "\n".join(lines)
+
+
+def run_budgets(sizes: List[int]) -> QueryBudget:
+    prepare_database()
+    sys.path.insert(0, ROOT_DIR)
+    from fastapi.testclient import TestClient
+
+    import monolith
+
+    with TestClient(monolith.app) as client:
+        budget = QueryBudget(client)
+        for size in sizes:
+            budget.run(size)
+    return budget
+
+
+def test_budgets_are_constant():
+    assert all(isinstance(limit, int) for limit in QUERY_BUDGETS.values())
+
+
+def test_query_budgets():
+    budget = run_budgets(DEFAULT_SIZES)
+    over = budget.over_budget()
+    assert not over, "Vượt ngân sách truy vấn:\n" + "\n".join(
+        f"{r['endpoint']} (size={r['size']}): {r['queries']} > {r['budget']} "
+        f"[{r['detail']}]"
+        for r in over
+    )
+    grows = budget.grows_with_size()
+    assert not grows, "Số truy vấn tăng theo size: " + ", ".join(grows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    budget = run_budgets(args.sizes)
+    print(budget.report())
+    over = budget.over_budget()
+    for r in over:
+        print(f"\n[ERROR] {r['endpoint']} (size={r['size']}): {r['detail']}")
+    grows = budget.grows_with_size()
+    for endpoint in grows:
+        print(f"\n[ERROR] {endpoint}: số truy vấn tăng theo size")
+    sys.exit(1 if over or grows else 0)